@@ -0,0 +1,142 @@
+# Load-testing and latency benchmark for the Players in Common app (EuropeanClubsApp.py)
+#
+# Drives the app headlessly through Streamlit's AppTest against a local copy of
+# final_all_european_players.csv, simulating N concurrent sessions that each
+# randomise teams, make some guesses and reveal the answers. Reports p50/p95/p99
+# rerun latency, throughput and memory per session to a JSON file.
+#
+# Usage:
+#   python BenchmarkEuropeanClubsApp.py --csv final_all_european_players.csv --sessions 20 --output bench_results.json
+
+import argparse
+import functools
+import http.server
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+APP_PATH = Path(__file__).with_name("EuropeanClubsApp.py")
+WRONG_GUESSES = ["Pelé", "Diego Maradona", "Johan Cruyff", "Ferenc Puskás"]
+
+# Serve the CSV over local HTTP so the app's loader (and its revalidation) runs exactly as deployed
+def serve_csv(csv_path):
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(csv_path.parent))
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/{csv_path.name}"
+
+def timed_run(element, timings, step):
+    start = time.perf_counter()
+    app = element.run()
+    timings.append((step, time.perf_counter() - start))
+    if app.exception:
+        raise RuntimeError(f"{step} failed: {app.exception[0].message}")
+    return app
+
+def find_button(app, label):
+    return next(button for button in app.button if button.label == label)
+
+# One player's flow: load -> randomise teams -> a few guesses -> show answers
+def run_session(seed, guesses_per_session, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    timings = []
+    app = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    timed_run(app, timings, "load")
+
+    app = timed_run(find_button(app, "🎲 Randomise Teams").click(), timings, "randomise")
+
+    pair_result = app.session_state["pair_result"]
+    answers = list(pair_result.common_players) if pair_result else []
+    if answers:
+        for _ in range(guesses_per_session):
+            guess = rng.choice(answers) if rng.random() < 0.6 else rng.choice(WRONG_GUESSES)
+            app.text_input(key="guess_input").input(guess)
+            app = timed_run(find_button(app, "Submit Guess").click(), timings, "guess")
+
+        app = timed_run(find_button(app, "Show/Hide Answers").click(), timings, "show_answers")
+
+    return app, timings
+
+def percentiles(values):
+    if not values:
+        return {}
+    values_ms = np.array(values) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(values_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(values_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(values_ms, 99)), 3),
+        "max_ms": round(float(values_ms.max()), 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Players in Common app with concurrent headless sessions")
+    parser.add_argument("--csv", required=True, type=Path, help="Local copy of final_all_european_players.csv")
+    parser.add_argument("--sessions", type=int, default=20, help="Number of simulated sessions")
+    parser.add_argument("--concurrency", type=int, default=8, help="Sessions running at the same time")
+    parser.add_argument("--guesses", type=int, default=5, help="Guesses per session")
+    parser.add_argument("--memory-sessions", type=int, default=5, help="Sessions kept alive to measure memory per session")
+    parser.add_argument("--timeout", type=float, default=60, help="Timeout for a single rerun in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, default=Path("bench_results.json"))
+    args = parser.parse_args()
+
+    server, url = serve_csv(args.csv.resolve())
+    os.environ["PLAYERS_DATA_URL"] = url
+    os.environ["PLAYERS_SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="players_in_common_bench_")
+
+    # Cold start: the first session in the process downloads the CSV and builds the shared index
+    _, cold_timings = run_session(args.seed, 0, args.timeout)
+
+    # Warm, concurrent sessions sharing the process-level caches
+    all_timings = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(run_session, args.seed + i + 1, args.guesses, args.timeout) for i in range(args.sessions)]
+        for future in futures:
+            all_timings.extend(future.result()[1])
+    elapsed = time.perf_counter() - start
+
+    # Memory held per live session, measured separately so tracing doesn't skew the latencies
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    live_sessions = [run_session(args.seed + 10_000 + i, args.guesses, args.timeout)[0] for i in range(args.memory_sessions)]
+    retained = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, "filename"))
+    tracemalloc.stop()
+    server.shutdown()
+
+    steps = sorted({step for step, _ in all_timings})
+    results = {
+        "app": APP_PATH.name,
+        "csv": str(args.csv),
+        "sessions": args.sessions,
+        "concurrency": args.concurrency,
+        "guesses_per_session": args.guesses,
+        "cold_start_ms": round(cold_timings[0][1] * 1000, 3),
+        "reruns": percentiles([duration for _, duration in all_timings]),
+        "reruns_by_step": {step: percentiles([d for s, d in all_timings if s == step]) for step in steps},
+        "throughput_reruns_per_s": round(len(all_timings) / elapsed, 3),
+        "throughput_sessions_per_s": round(args.sessions / elapsed, 3),
+        "memory_per_session_kb": round(retained / max(len(live_sessions), 1) / 1024, 1),
+        "wall_time_s": round(elapsed, 3)
+    }
+
+    args.output.write_text(json.dumps(results, indent=2))
+    print(json.dumps(results, indent=2))
+    print(f"Mean rerun {statistics.mean(d for _, d in all_timings) * 1000:.1f} ms - results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
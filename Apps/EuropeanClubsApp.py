@@ -1,10 +1,189 @@
 import streamlit as st
 import pandas as pd
+import pyarrow.feather as feather
 import requests
 import random
-from io import StringIO
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from io import BytesIO
+from pathlib import Path
 import unicodedata
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+
+DATA_URL = os.environ.get("PLAYERS_DATA_URL", "https://raw.githubusercontent.com/JulianB22/Football/main/data/final_all_european_players.csv")
+SNAPSHOT_DIR = Path(os.environ.get("PLAYERS_SNAPSHOT_DIR", Path(tempfile.gettempdir()) / "players_in_common"))
+REVALIDATE_TTL = 15 * 60
+MATCH_THRESHOLD = 90
+PAIR_CACHE_SIZE = 512
+
+# Prepare the raw CSV once, before it is snapshotted, so readers get ready-made columns
+def prepare_players(df):
+    df['Squad'] = df['Squad'].astype(str).str.strip()
+    df['Squad_normalized'] = df['Squad'].str.casefold()
+    df['YearBorn'] = pd.to_numeric(df['Born'], errors='coerce', downcast='integer')
+    return df
+
+# Fetches the players CSV at most once per TTL for the whole process. The parsed data
+# is kept as a Feather snapshot on disk which is memory-mapped on cold start, revalidated
+# with ETag/If-Modified-Since, and used as a fallback when GitHub can't be reached.
+class DatasetLoader:
+    def __init__(self, url, snapshot_dir, ttl):
+        self.url = url
+        self.ttl = ttl
+        self.snapshot_path = Path(snapshot_dir) / "final_all_european_players.feather"
+        self.meta_path = Path(snapshot_dir) / "final_all_european_players.json"
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+        self.df = None
+        self.version = None
+        self.checked_at = None
+
+    def get(self):
+        with self.lock:
+            if self.df is None or time.monotonic() - self.checked_at > self.ttl:
+                self.refresh()
+            return self.df, self.version
+
+    def refresh(self):
+        meta = self.read_meta()
+        headers = {}
+        if meta and self.snapshot_path.exists():
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = self.session.get(self.url, headers=headers, timeout=10)
+            if response.status_code == 304:
+                if self.df is None:
+                    self.load_snapshot(meta)
+            else:
+                response.raise_for_status()
+                self.store(response)
+        except requests.RequestException:
+            # Offline or GitHub unavailable: keep what we have, or fall back to the snapshot
+            if self.df is None:
+                if not (meta and self.snapshot_path.exists()):
+                    raise
+                self.load_snapshot(meta)
+        self.checked_at = time.monotonic()
+
+    def store(self, response):
+        version = hashlib.sha1(response.content).hexdigest()[:12]
+        df = prepare_players(pd.read_csv(BytesIO(response.content)))
+        meta = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'version': version
+        }
+
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so other processes never read a half-written snapshot
+            tmp_path = self.snapshot_path.with_suffix('.tmp')
+            df.reset_index(drop=True).to_feather(tmp_path, compression='uncompressed')
+            os.replace(tmp_path, self.snapshot_path)
+            self.meta_path.write_text(json.dumps(meta))
+        except OSError:
+            pass
+
+        self.df = df
+        self.version = version
+
+    def load_snapshot(self, meta):
+        self.df = feather.read_table(self.snapshot_path, memory_map=True).to_pandas()
+        self.version = meta['version']
+
+    def read_meta(self):
+        try:
+            return json.loads(self.meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+@st.cache_resource(show_spinner=False)
+def get_dataset_loader():
+    return DatasetLoader(DATA_URL, SNAPSHOT_DIR, REVALIDATE_TTL)
+
+# Build the squad -> player lookup once per process rather than on every rerun.
+# Players are keyed on their accent-folded name and birth year, so finding the
+# players two teams have in common is a single set intersection.
+@st.cache_resource(show_spinner=False, max_entries=2)
+def build_squad_index(_df, data_version):
+    players = _df.dropna(subset=['Player', 'YearBorn'])
+    folded = {name: EuroQuiz.normalize_string(name.lower()) for name in players['Player'].unique()}
+    keys = pd.Series(list(zip(players['Player'].map(folded), players['YearBorn'])), index=players.index)
+
+    squad_index = keys.groupby(players['Squad_normalized']).agg(frozenset).to_dict()
+    # Keep the first spelling seen for each key to display in the answers
+    player_names = dict(zip(keys[::-1], players['Player'][::-1]))
+    return squad_index, player_names
+
+# Scores a guess against every answer's full name and surname in a single rapidfuzz call.
+# The answers are normalised once when the matcher is built, not on every guess.
+class AnswerMatcher:
+    def __init__(self, players):
+        self.players = tuple(sorted(players))
+        names = [EuroQuiz.normalize_string(player.lower()) for player in self.players]
+        self.choices = tuple(names + [name.split()[-1] for name in names])
+
+    def match(self, guess_normalized):
+        best = process.extractOne(guess_normalized, self.choices, scorer=fuzz.token_set_ratio, score_cutoff=MATCH_THRESHOLD)
+        if best is None:
+            return None
+        return self.players[best[2] % len(self.players)]
+
+# Everything a session needs for one team pair. It is shared between sessions, so it is never modified.
+PairResult = namedtuple('PairResult', ['common_raw', 'common_players', 'matcher'])
+
+# Bounded LRU cache of pair results shared by every session in the process. Keys are the
+# unordered pair of normalised team names plus the dataset version, so Arsenal-Barcelona
+# and Barcelona-Arsenal share an entry and a dataset refresh never serves stale answers.
+class PairCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, team1_norm, team2_norm, data_version, compute):
+        key = (frozenset((team1_norm, team2_norm)), data_version)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        # Compute outside the lock so one slow pair doesn't block other sessions
+        result = compute()
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return result
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self.entries),
+                'maxsize': self.maxsize
+            }
+
+@st.cache_resource(show_spinner=False)
+def get_pair_cache():
+    return PairCache(PAIR_CACHE_SIZE)
 
 class EuroQuiz:
     def __init__(self):
@@ -19,32 +198,25 @@ class EuroQuiz:
 
     def load_data(self):
         try:
-            url = "https://raw.githubusercontent.com/JulianB22/Football/main/data/final_all_european_players.csv"
-            response = requests.get(url)
-            response.raise_for_status()
-
-            csv_string = StringIO(response.text)
-            self.df = pd.read_csv(csv_string)
-
-            self.df['Squad'] = self.df['Squad'].astype(str).str.strip()
-            self.df['Squad_normalized'] = self.df['Squad'].str.casefold()
-            self.df['YearBorn'] = pd.to_numeric(self.df['Born'], errors='coerce', downcast='integer')
+            # Shared across sessions, so it must never be modified in place
+            self.df, self.data_version = get_dataset_loader().get()
 
             self.leagues = sorted(self.df['League'].unique())
             self.team_map = dict(zip(self.df['Squad_normalized'], self.df['Squad']))
             self.all_teams = sorted(self.team_map.keys())
+            self.squad_index, self.player_names = build_squad_index(self.df, self.data_version)
 
         except Exception as e:
             st.error(f"Error loading data: {str(e)}")
             st.stop()
 
     def initialize_session_state(self):
-        if 'common_players' not in st.session_state:
-            st.session_state.common_players = []
-        if 'common_raw' not in st.session_state:
-            st.session_state.common_raw = set()
+        if 'pair_result' not in st.session_state:
+            st.session_state.pair_result = None
         if 'guesses' not in st.session_state:
             st.session_state.guesses = []
+        if 'guess_verdicts' not in st.session_state:
+            st.session_state.guess_verdicts = {}
         if 'show_answers' not in st.session_state:
             st.session_state.show_answers = False
         if 'correct_count' not in st.session_state:
@@ -61,10 +233,10 @@ class EuroQuiz:
             st.session_state.previous_team2 = ""
 
     def find_players_for_team(self, team_normalized):
-        team_df = self.df[self.df['Squad_normalized'] == team_normalized]
-        return set(zip(team_df['Player'], team_df['YearBorn']))
+        return self.squad_index.get(team_normalized, frozenset())
 
-    def normalize_string(self, text):
+    @staticmethod
+    def normalize_string(text):
         return ''.join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
 
     def get_normalized_team_name(self, team_display_name):
@@ -141,35 +313,36 @@ class EuroQuiz:
         # If team selection changed, reset session state
         if (team1_norm != st.session_state.previous_team1) or (team2_norm != st.session_state.previous_team2):
             st.session_state.guesses = []
+            st.session_state.guess_verdicts = {}
             st.session_state.correct_count = 0
             st.session_state.show_answers = False
-            st.session_state.common_players = []
-            st.session_state.common_raw = set()
+            st.session_state.pair_result = None
             st.session_state.previous_team1 = team1_norm
             st.session_state.previous_team2 = team2_norm
 
         if team1_norm != team2_norm:
             self.find_connections(team1_norm, team2_norm)
 
-        if st.session_state.common_players:
+        if st.session_state.pair_result and st.session_state.pair_result.common_players:
             self.show_quiz_interface()
 
-    def find_connections(self, team1_norm, team2_norm):
-        team1_players = self.find_players_for_team(team1_norm)
-        team2_players = self.find_players_for_team(team2_norm)
-
-        common = set()
-        for player1, year1 in team1_players:
-            for player2, year2 in team2_players:
-                if self.normalize_string(player1.lower()) == self.normalize_string(player2.lower()) and year1 == year2:
-                    common.add((player1, year1))
+    def compute_connections(self, team1_norm, team2_norm):
+        common_keys = self.find_players_for_team(team1_norm) & self.find_players_for_team(team2_norm)
+        common_raw = frozenset((self.player_names[key], key[1]) for key in common_keys)
+        common_players = tuple(sorted(player for player, _ in common_raw))
+        return PairResult(common_raw, common_players, AnswerMatcher(common_players))
 
-        st.session_state.common_raw = common
-        st.session_state.common_players = sorted([p for p, y in common if pd.notna(y)])
+    def find_connections(self, team1_norm, team2_norm):
+        # Only look the pair up when it changes; the session then keeps a reference to the shared result
+        if st.session_state.pair_result is None:
+            st.session_state.pair_result = get_pair_cache().get(
+                team1_norm, team2_norm, self.data_version,
+                lambda: self.compute_connections(team1_norm, team2_norm)
+            )
 
         team1_display = self.team_map.get(team1_norm, team1_norm.title())
         team2_display = self.team_map.get(team2_norm, team2_norm.title())
-        st.info(f"🎯 Find {len(st.session_state.common_players)} players who have played for both {team1_display} and {team2_display}")
+        st.info(f"🎯 Find {len(st.session_state.pair_result.common_players)} players who have played for both {team1_display} and {team2_display}")
 
     def show_quiz_interface(self):
         col1, col2, col3 = st.columns([2, 1, 1])
@@ -181,18 +354,12 @@ class EuroQuiz:
 
                 if submitted and guess:
                     guess_normalized = self.normalize_string(guess.strip().lower())
-                    already_guessed = [self.normalize_string(g.lower()) for g in st.session_state.guesses]
 
-                    if guess_normalized not in already_guessed:
+                    # Each guess is scored once and its verdict kept, so older guesses are never re-scored
+                    if guess_normalized not in st.session_state.guess_verdicts:
+                        matched = st.session_state.pair_result.matcher.match(guess_normalized) is not None
                         st.session_state.guesses.append(guess)
-                        matched = False
-                        for player, _ in st.session_state.common_raw:
-                            player_norm = self.normalize_string(player.lower())
-                            surname = self.normalize_string(player.split()[-1].lower())
-                            if (fuzz.token_set_ratio(guess_normalized, player_norm) >= 90 or
-                                fuzz.token_set_ratio(guess_normalized, surname) >= 90):
-                                matched = True
-                                break
+                        st.session_state.guess_verdicts[guess_normalized] = matched
                         if matched:
                             st.session_state.correct_count += 1
 
@@ -205,40 +372,29 @@ class EuroQuiz:
 
         if st.session_state.show_answers:
             st.write("### 📝 All Players")
-            for player in st.session_state.common_players:
+            for player in st.session_state.pair_result.common_players:
                 st.write(f"• {player}")
 
     def show_results(self):
-        correct_names = {self.normalize_string(name.lower()) for name, _ in st.session_state.common_raw}
-        guessed = {self.normalize_string(g.lower()): g for g in st.session_state.guesses}
-
-        correct_guesses = []
-        incorrect_guesses = []
-
-        for guess_norm, original_guess in guessed.items():
-            match_found = False
-            for name in correct_names:
-                if fuzz.token_set_ratio(guess_norm, name) >= 90:
-                    match_found = True
-                    break
-            if match_found:
-                correct_guesses.append(original_guess)
-            else:
-                incorrect_guesses.append(original_guess)
+        # Guesses and their memoised verdicts are appended together, so they line up
+        results = list(zip(st.session_state.guesses, st.session_state.guess_verdicts.values()))
+        correct_count = sum(matched for _, matched in results)
+        incorrect_count = len(results) - correct_count
 
-        st.progress(len(correct_guesses) / len(st.session_state.common_players))
+        common_players = st.session_state.pair_result.common_players
+        st.progress(correct_count / len(common_players))
 
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("✅ Correct", len(correct_guesses))
+            st.metric("✅ Correct", correct_count)
         with col2:
-            st.metric("❌ Incorrect", len(incorrect_guesses))
+            st.metric("❌ Incorrect", incorrect_count)
         with col3:
-            st.metric("🎯 Remaining", len(st.session_state.common_players) - len(correct_guesses))
+            st.metric("🎯 Remaining", len(common_players) - correct_count)
 
         st.write("### Your Guesses")
-        for guess in st.session_state.guesses:
-            if guess in correct_guesses:
+        for guess, matched in results:
+            if matched:
                 st.success(f"✅ {guess}")
             else:
                 st.error(f"❌ {guess}")
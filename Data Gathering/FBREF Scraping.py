@@ -1,8 +1,13 @@
 #FBREF Scraping - Big 5 Leagues
 
 import pandas as pd
+import fetch
 
-df = pd.read_html('https://fbref.com/en/comps/Big5/stats/players/Big-5-European-Leagues-Stats', attrs={'id': 'stats_standard'})[0]
+# All requests go through fetch, which rate limits FBref and caches pages on disk. Pages of
+# finished seasons never change and are cached for good; the current season's stats pages
+# (no season in the URL) are re-checked at most daily
+current_season_max_age = 24 * 60 * 60
+df = fetch.read_html('https://fbref.com/en/comps/Big5/stats/players/Big-5-European-Leagues-Stats', attrs={'id': 'stats_standard'}, max_age=current_season_max_age)[0]
 
 df.columns = ['_'.join(col).strip() for col in df.columns.values]
 
@@ -11,7 +16,7 @@ df.head()
 
 # FBREF Scraping - Champions League
 
-df = pd.read_html('https://fbref.com/en/comps/8/2023-2024/2023-2024-Champions-League-Stats', attrs={'id': 'results2023-202480_overall'})[0]
+df = fetch.read_html('https://fbref.com/en/comps/8/2023-2024/2023-2024-Champions-League-Stats', attrs={'id': 'results2023-202480_overall'})[0]
 
 df = df.dropna(subset=['Rk'])
 
@@ -19,14 +24,14 @@ df.head()
 
 
 # FBREF Scraping - Premier League - Arsenal 
-df = pd.read_html('https://fbref.com/en/squads/18bb7c10/2022-2023/Arsenal-Stats', attrs={'id': 'stats_standard_9'})[0]
+df = fetch.read_html('https://fbref.com/en/squads/18bb7c10/2022-2023/Arsenal-Stats', attrs={'id': 'stats_standard_9'})[0]
 
 df.columns = ['_'.join(col).strip() for col in df.columns.values]
 
 df.head()
 
 # FBREF Scraping - La Liga - FC Barcelona 
-df = pd.read_html('https://fbref.com/en/squads/206d90db/2023-2024/Barcelona-Stats', attrs={'id': 'stats_standard_12'})[0]
+df = fetch.read_html('https://fbref.com/en/squads/206d90db/2023-2024/Barcelona-Stats', attrs={'id': 'stats_standard_12'})[0]
 
 df.columns = ['_'.join(col).strip() for col in df.columns.values]
 
@@ -35,11 +40,10 @@ df.head()
 
 # FBREF Scraping - Primeira Liga
 
-import requests
 import bs4
 from io import StringIO
 
-response = requests.get('https://fbref.com/en/comps/32/stats/Primeira-Liga-Stats')
+response = fetch.get('https://fbref.com/en/comps/32/stats/Primeira-Liga-Stats', max_age=current_season_max_age)
 soup = bs4.BeautifulSoup(response.content)
 
 comments = soup.find_all(string=lambda text: isinstance(text, bs4.Comment))
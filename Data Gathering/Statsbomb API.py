@@ -1,6 +1,7 @@
 #STATSBOMB - All Competitions
 
-from statsbombpy import sb
+# Calls go through a local disk cache, so each match is only downloaded once
+from statsbomb_cache import sb
 
 # Find competitions id
 competitions = sb.competitions()
@@ -1,48 +1,12 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import time
+from transfermarkt_values import scrape_market_values
 
 # Create a list of players e.g. 2024 Ballon d'Or finalists
 player_list = ['Rodri', 'Vinicius Junior', 'Jude Bellingham', 'Dani Carvajal', 'Erling Haaland']
 
-# Base URL for player search
-base_url = "https://www.transfermarkt.com/schnellsuche/ergebnis/schnellsuche?query="
+# Search Transfermarkt for every player concurrently, within a polite request rate.
+# Results are written to the CSV as they arrive, so re-running only scrapes players that are missing.
+# In a notebook use: df_results = await scrape_market_values_async(player_list)
+df_results = scrape_market_values(player_list, output='transfermarkt_market_values.csv')
 
-# DataFrame to store results
-results = []
-
-
-# Iterate through the player list with a counter
-for i, player in enumerate(player_list, start=1):
-    # Format the player name for the URL
-    search_url = base_url + player.replace(" ", "+")
-    # Print the stage of the scraping process and the players which have been scraped
-    print(f"{i}/{len(player_list)}: {player}")
-
-    try:
-        # Fetch the page
-        response = requests.get(search_url, headers={"User-Agent": "Mozilla/5.0"})
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # Extract the market value
-        market_value_tag = soup.find("td", class_="rechts hauptlink")  # Target the specific class
-        if market_value_tag:
-            market_value = market_value_tag.text.strip()
-        else:
-            market_value = "Not Found"
-
-        # Append the result
-        results.append({"Player": player, "Market Value": market_value})
-    except Exception as e:
-        results.append({"Player": player, "Market Value": "Error: " + str(e)})
-
-    # Pause to avoid being blocked by the website
-    time.sleep(2)
-
-# Convert results to DataFrame
-df_results = pd.DataFrame(results)
-
-# Display results
+# Display results ('market_value_eur' holds the market value in euros as a number)
 print(df_results)
@@ -0,0 +1,204 @@
+# FBREF Premier League player database scraper (1992 onwards)
+#
+# FBref ships the standard stats table inside an HTML comment and uncomments it with
+# JavaScript, which is why the notebooks started a fresh headless Chrome for every season.
+# Here each season page is fetched over plain HTTP (through fetch, so it is rate limited and
+# cached) and the table is pulled out of the comments, as in FBREF Scraping.py. A single
+# reused browser is only started for seasons where that fails. Each season is saved to its
+# own checkpoint file, so a failed run resumes where it stopped. Given a PlayerStore, the
+# checkpoints are ingested into it afterwards, which only rewrites the seasons that changed.
+#
+# Usage:
+#   df = scrape_seasons(range(2024, 1991, -1))
+#   df = scrape_seasons(range(2024, 1991, -1), store=PlayerStore('player_store'))
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import bs4
+import pandas as pd
+
+import fetch
+
+CURRENT_SEASON = 2024
+CHECKPOINT_DIR = Path('fbref_seasons')
+TABLE_ID = 'stats_standard'
+COLUMNS = ['Player', 'Squad', 'Age', 'Nationality', 'Season']
+LEAGUE = 'Premier League'
+
+
+def get_season_url(year):
+    """Generate URL for a specific Premier League season."""
+    if year == CURRENT_SEASON:
+        return "https://fbref.com/en/comps/9/stats/Premier-League-Stats"
+    else:
+        return f"https://fbref.com/en/comps/9/{year}-{year+1}/stats/{year}-{year+1}-Premier-League-Stats"
+
+
+def find_stats_table(page, table_id=TABLE_ID):
+    """Find the stats table in the page, including tables FBref hides in HTML comments."""
+    soup = bs4.BeautifulSoup(page, 'lxml')
+    table = soup.find('table', {'id': table_id})
+    if table is not None:
+        return table
+
+    for comment in soup.find_all(string=lambda text: isinstance(text, bs4.Comment)):
+        if table_id in comment:
+            table = bs4.BeautifulSoup(comment, 'lxml').find('table', {'id': table_id})
+            if table is not None:
+                return table
+    return None
+
+
+def parse_players(table, year):
+    """Extract player, squad, age and nationality from every row of the stats table."""
+    all_players = []
+    for row in table.find('tbody').find_all('tr'):
+        cells = {td['data-stat']: td.get_text(strip=True) for td in row.find_all('td') if td.has_attr('data-stat')}
+        # Skip the repeated header rows FBref inserts every 25 players
+        if 'player' not in cells or 'team' not in cells:
+            continue
+        all_players.append({
+            'Player': cells['player'],
+            'Squad': cells['team'],
+            'Age': cells.get('age', ''),
+            'Nationality': cells.get('nationality', '')
+        })
+
+    df = pd.DataFrame(all_players, columns=COLUMNS[:-1])
+    df['Season'] = f'{year}-{year+1}'
+    return df
+
+
+def scrape_season_http(year, fetcher):
+    # Finished seasons never change, so only the current one is re-checked (at most daily)
+    max_age = 24 * 60 * 60 if year == CURRENT_SEASON else None
+    table = find_stats_table(fetcher.get_text(get_season_url(year), max_age=max_age))
+    return None if table is None else parse_players(table, year)
+
+
+# One headless Chrome, started on first use and shared by every season that needs it
+class BrowserFallback:
+    def __init__(self):
+        self.driver = None
+
+    def setup_driver(self):
+        """Set up Chrome WebDriver with appropriate options."""
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        chrome_options = Options()
+        chrome_options.add_argument('--headless=new')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--window-size=1920x1080')
+        chrome_options.add_argument(f'--user-agent={fetch.USER_AGENT}')
+        chrome_options.add_experimental_option('excludeSwitches', ['enable-automation'])
+        chrome_options.add_experimental_option('useAutomationExtension', False)
+
+        service = Service(ChromeDriverManager().install())
+        return webdriver.Chrome(service=service, options=chrome_options)
+
+    def scrape_season(self, year):
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        if self.driver is None:
+            self.driver = self.setup_driver()
+        self.driver.get(get_season_url(year))
+        WebDriverWait(self.driver, 20).until(EC.presence_of_element_located((By.CSS_SELECTOR, f'table#{TABLE_ID}')))
+        table = find_stats_table(self.driver.page_source)
+        return None if table is None else parse_players(table, year)
+
+    def quit(self):
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
+
+
+def checkpoint_path(checkpoint_dir, year):
+    return Path(checkpoint_dir) / f'season_{year}-{year+1}.csv'
+
+
+def save_checkpoint(df, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    df.to_csv(tmp_path, index=False)
+    tmp_path.replace(path)
+
+
+def read_checkpoint(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+def scrape_seasons(years, checkpoint_dir=CHECKPOINT_DIR, workers=4, use_browser=True, refresh_current=True, fetcher=None,
+                   store=None):
+    """Scrape player lists for several seasons, resuming from any seasons already checkpointed."""
+    years = list(years)
+    fetcher = fetcher or fetch.default_fetcher()
+    results = {}
+
+    todo = []
+    for year in years:
+        path = checkpoint_path(checkpoint_dir, year)
+        if path.exists() and not (refresh_current and year == CURRENT_SEASON):
+            results[year] = read_checkpoint(path)
+        else:
+            todo.append(year)
+    print(f"{len(results)} seasons already scraped, {len(todo)} to go")
+
+    def scrape(year):
+        try:
+            return year, scrape_season_http(year, fetcher)
+        except Exception as e:
+            print(f"Error fetching {year}-{year+1}: {e}")
+            return year, None
+
+    # Fetches share fetch's FBref rate limit, so the workers overlap parsing with waiting rather than
+    # hitting the site harder
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for year, df in pool.map(scrape, todo):
+            if df is None or df.empty:
+                failed.append(year)
+                continue
+            save_checkpoint(df, checkpoint_path(checkpoint_dir, year))
+            results[year] = df
+            print(f"{year}-{year+1}: {len(df)} players")
+
+    if failed and use_browser:
+        browser = BrowserFallback()
+        try:
+            for year in failed[:]:
+                try:
+                    df = browser.scrape_season(year)
+                except Exception as e:
+                    print(f"Browser failed for {year}-{year+1}: {e}")
+                    continue
+                if df is not None and not df.empty:
+                    save_checkpoint(df, checkpoint_path(checkpoint_dir, year))
+                    results[year] = df
+                    failed.remove(year)
+                    print(f"{year}-{year+1}: {len(df)} players (browser)")
+                time.sleep(random.uniform(3, 5))
+        finally:
+            browser.quit()
+
+    if failed:
+        print(f"Failed to scrape seasons: {', '.join(f'{year}-{year+1}' for year in failed)} - run again to retry")
+
+    if store is not None:
+        # Every checkpoint is the store's input, so seasons scraped in earlier runs are kept
+        written = store.ingest_files(Path(checkpoint_dir).glob('season_*.csv'), league=LEAGUE, read=read_checkpoint)
+        print(f"Player store: rewrote {len(written)} partitions")
+
+    frames = [results[year] for year in years if year in results]
+    if not frames:
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.concat(frames, ignore_index=True)
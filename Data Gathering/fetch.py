@@ -0,0 +1,252 @@
+# Shared HTTP fetch layer for the scrapers
+#
+# Every scraper goes through one pooled requests.Session (HTTP keep-alive), a per-host
+# rate limit so we stay polite to FBref, Transfermarkt, Understat and the BBC, and an
+# on-disk response cache. Cached bodies are stored by the hash of their content, and
+# stale entries are revalidated with ETag/If-Modified-Since, so rerunning a historical
+# pull reads from disk instead of the network.
+#
+# Usage:
+#   import fetch
+#   df = fetch.read_html('https://fbref.com/en/comps/9/stats/Premier-League-Stats', attrs={'id': 'stats_standard'})[0]
+#   response = fetch.get('https://understat.com/league/EPL', max_age=3600)
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+CACHE_DIR = Path(os.environ.get('FOOTBALL_HTTP_CACHE', Path.home() / '.cache' / 'football-http'))
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+# Minimum seconds between requests to each host (FBref allows 10 requests a minute)
+RATE_LIMITS = {
+    'fbref.com': 6.0,
+    'transfermarkt.com': 2.0,
+    'understat.com': 1.0,
+    'bbc.com': 1.0,
+    'bbc.co.uk': 1.0
+}
+DEFAULT_RATE_LIMIT = 1.0
+
+
+# Token bucket per host. With the default burst of 1 this is a plain minimum interval.
+class HostRateLimiter:
+    def __init__(self, limits=None, default=DEFAULT_RATE_LIMIT, burst=1):
+        self.limits = dict(RATE_LIMITS if limits is None else limits)
+        self.default = default
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def interval(self, host):
+        for domain, interval in self.limits.items():
+            if host == domain or host.endswith('.' + domain):
+                return interval
+        return self.default
+
+    # Reserve the next slot for a host and return how long to wait for it
+    def reserve(self, host):
+        interval = self.interval(host)
+        with self.lock:
+            now = time.monotonic()
+            tokens, updated = self.buckets.get(host, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) / interval if interval else self.burst)
+            delay = 0.0 if tokens >= 1 else (1 - tokens) * interval
+            self.buckets[host] = (tokens - 1, now)
+            return delay
+
+    def wait(self, host):
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+
+
+# A response rebuilt from the cache, with the parts of requests.Response the scrapers use
+class CachedResponse:
+    def __init__(self, url, content, headers, status_code=200, from_cache=True):
+        self.url = url
+        self.content = content
+        self.headers = CaseInsensitiveDict(headers)
+        self.status_code = status_code
+        self.from_cache = from_cache
+
+    @property
+    def encoding(self):
+        return requests.utils.get_encoding_from_headers(self.headers) or 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} for url: {self.url}")
+
+
+# Content-addressed cache: bodies are stored once under the hash of their content, and a
+# small index entry per request (method + URL + params) points at the body and keeps its validators
+class ResponseCache:
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = Path(directory)
+
+    def request_key(self, url, params=None):
+        if params:
+            url = f"{url}{'&' if urlsplit(url).query else '?'}{urlencode(sorted(params.items()))}"
+        return hashlib.sha256(f"GET {url}".encode('utf-8')).hexdigest()
+
+    def index_path(self, key):
+        return self.directory / 'index' / key[:2] / f'{key}.json'
+
+    def body_path(self, digest):
+        return self.directory / 'bodies' / digest[:2] / digest
+
+    def load(self, key):
+        try:
+            entry = json.loads(self.index_path(key).read_text())
+            body = self.body_path(entry['digest']).read_bytes()
+        except (OSError, ValueError, KeyError):
+            return None, None
+        # Treat a body that doesn't match its hash as a miss
+        if hashlib.sha256(body).hexdigest() != entry['digest']:
+            return None, None
+        return entry, body
+
+    def store(self, key, url, content, headers):
+        digest = hashlib.sha256(content).hexdigest()
+        body_path = self.body_path(digest)
+        if not body_path.exists():
+            write_atomic(body_path, content)
+
+        entry = {
+            'url': url,
+            'digest': digest,
+            'fetched_at': time.time(),
+            'headers': {name: headers[name] for name in ('Content-Type', 'ETag', 'Last-Modified') if name in headers}
+        }
+        write_atomic(self.index_path(key), json.dumps(entry).encode('utf-8'))
+        return entry
+
+    def touch(self, key, entry):
+        entry['fetched_at'] = time.time()
+        write_atomic(self.index_path(key), json.dumps(entry).encode('utf-8'))
+
+
+def write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class Fetcher:
+    def __init__(self, cache_dir=CACHE_DIR, rate_limiter=None, pool_size=16, retries=3, timeout=30):
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.rate_limiter = rate_limiter or HostRateLimiter()
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        retry = Retry(total=retries, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504], respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    # GET a URL through the cache. max_age=None reuses a cached body forever (historical pages),
+    # otherwise entries older than max_age seconds are revalidated with a conditional request.
+    def get(self, url, params=None, headers=None, max_age=None):
+        key, entry, body = self.lookup(url, params)
+        if self.is_fresh(entry, max_age):
+            return CachedResponse(url, body, entry['headers'])
+
+        self.rate_limiter.wait(urlsplit(url).hostname or '')
+        response = self.session.get(url, params=params, headers=self.conditional_headers(entry, headers), timeout=self.timeout)
+        return self.complete(key, url, entry, body, response)
+
+    # The same as get for asyncio code: the rate limit is awaited rather than slept, and the
+    # request runs in a worker thread so the event loop keeps going
+    async def aget(self, url, params=None, headers=None, max_age=None):
+        key, entry, body = self.lookup(url, params)
+        if self.is_fresh(entry, max_age):
+            return CachedResponse(url, body, entry['headers'])
+
+        await asyncio.sleep(self.rate_limiter.reserve(urlsplit(url).hostname or ''))
+        response = await asyncio.to_thread(
+            self.session.get, url, params=params, headers=self.conditional_headers(entry, headers), timeout=self.timeout
+        )
+        return self.complete(key, url, entry, body, response)
+
+    def lookup(self, url, params):
+        if not self.cache:
+            return None, None, None
+        key = self.cache.request_key(url, params)
+        return (key,) + self.cache.load(key)
+
+    def is_fresh(self, entry, max_age):
+        return entry is not None and (max_age is None or time.time() - entry['fetched_at'] <= max_age)
+
+    def conditional_headers(self, entry, headers):
+        request_headers = dict(headers or {})
+        if entry:
+            if 'ETag' in entry['headers']:
+                request_headers['If-None-Match'] = entry['headers']['ETag']
+            if 'Last-Modified' in entry['headers']:
+                request_headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return request_headers
+
+    def complete(self, key, url, entry, body, response):
+        if response.status_code == 304 and entry:
+            self.cache.touch(key, entry)
+            return CachedResponse(url, body, entry['headers'])
+
+        response.raise_for_status()
+        if self.cache:
+            self.cache.store(key, url, response.content, response.headers)
+        # Always hand back our own response type: importing statsbombpy swaps every requests.Session
+        # for a requests_cache one, whose responses don't let from_cache be set
+        return CachedResponse(response.url, response.content, response.headers, response.status_code, from_cache=False)
+
+    def get_text(self, url, **kwargs):
+        return self.get(url, **kwargs).text
+
+    def read_html(self, url, params=None, headers=None, max_age=None, **kwargs):
+        return pd.read_html(StringIO(self.get_text(url, params=params, headers=headers, max_age=max_age)), **kwargs)
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+# One fetcher (and connection pool) per process, shared by every scraper
+def default_fetcher():
+    global _default_fetcher
+    with _default_lock:
+        if _default_fetcher is None:
+            _default_fetcher = Fetcher()
+        return _default_fetcher
+
+
+def get(url, **kwargs):
+    return default_fetcher().get(url, **kwargs)
+
+
+def get_text(url, **kwargs):
+    return default_fetcher().get_text(url, **kwargs)
+
+
+def read_html(url, **kwargs):
+    return default_fetcher().read_html(url, **kwargs)
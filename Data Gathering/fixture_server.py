@@ -0,0 +1,118 @@
+# Local stand-in HTTP server for testing the scrapers without hitting the real sites
+#
+# Serves recorded pages from memory or from a directory, with ETag and Last-Modified
+# validators so conditional requests get a 304, and counts the requests it receives.
+# Pages can be swapped while it is running to replay a sequence of recordings.
+#
+# Usage:
+#   with FixtureServer({'/en/comps/9/stats/Premier-League-Stats': Path('recorded/pl_stats.html')}) as server:
+#       fetcher = fetch.Fetcher(cache_dir=tmp_dir)
+#       fetcher.read_html(server.url('/en/comps/9/stats/Premier-League-Stats'))
+#       assert server.hits['/en/comps/9/stats/Premier-League-Stats'] == 1
+
+import email.utils
+import hashlib
+import http.server
+import mimetypes
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlsplit
+
+
+class FixtureServer:
+    def __init__(self, pages=None, directory=None, host='127.0.0.1', port=0):
+        self.pages = {}
+        self.directory = Path(directory) if directory else None
+        self.hits = Counter()
+        self.not_modified = Counter()
+        self.lock = threading.Lock()
+        for path, body in (pages or {}).items():
+            self.set_page(path, body)
+
+        self.server = http.server.ThreadingHTTPServer((host, port), self.make_handler())
+        self.thread = None
+
+    # Replace (or add) the page served at a path. body can be bytes, str or a Path to a recording.
+    def set_page(self, path, body, content_type=None):
+        if isinstance(body, Path):
+            content_type = content_type or mimetypes.guess_type(body.name)[0]
+            body = body.read_bytes()
+        elif isinstance(body, str):
+            body = body.encode('utf-8')
+
+        with self.lock:
+            self.pages[path] = {
+                'body': body,
+                'content_type': content_type or 'text/html; charset=utf-8',
+                'etag': '"' + hashlib.sha1(body).hexdigest() + '"',
+                'last_modified': email.utils.formatdate(time.time(), usegmt=True)
+            }
+
+    def find_page(self, path):
+        with self.lock:
+            page = self.pages.get(path)
+        if page is None and self.directory:
+            file_path = (self.directory / path.lstrip('/')).resolve()
+            if file_path.is_file() and self.directory.resolve() in file_path.parents:
+                self.set_page(path, file_path)
+                page = self.pages[path]
+        return page
+
+    def make_handler(self):
+        fixture = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                fixture.hits[path] += 1
+                page = fixture.find_page(path)
+                if page is None:
+                    self.send_error(404)
+                    return
+
+                # If-None-Match wins over If-Modified-Since, as in RFC 9110
+                if self.headers.get('If-None-Match') is not None:
+                    fresh = self.headers['If-None-Match'] == page['etag']
+                else:
+                    fresh = self.headers.get('If-Modified-Since') == page['last_modified']
+
+                if fresh:
+                    fixture.not_modified[path] += 1
+                    self.send_response(304)
+                    self.send_header('ETag', page['etag'])
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', page['content_type'])
+                self.send_header('Content-Length', str(len(page['body'])))
+                self.send_header('ETag', page['etag'])
+                self.send_header('Last-Modified', page['last_modified'])
+                self.end_headers()
+                self.wfile.write(page['body'])
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def url(self, path='/'):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}{path}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
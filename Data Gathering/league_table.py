@@ -0,0 +1,200 @@
+# Live league table watcher with row-level change detection
+#
+# fetch_premier_league_table in the BBC Sport notebook fetches and parses the whole page every
+# time it is called, so polling it on a matchday re-parses the same HTML over and over. The
+# watcher here polls on asyncio with conditional requests (an unchanged page costs a 304) and
+# hashes just the <table> region of the body first: adverts and timestamps elsewhere on the
+# page don't trigger a parse. Only when the table itself changed is it parsed
+# and compared with the previous one, and subscribers get the rows that were added, removed
+# or changed. The newest table is kept in memory, so watcher.latest never waits on the network.
+#
+# Usage:
+#   watcher = TableWatcher(BBC_URL, interval=30)
+#   watcher.subscribe(print_changes)          # called with a list of RowChange
+#   changes = watcher.queue()                 # or: await changes.get()
+#   watcher.start()                           # inside a running event loop (e.g. Jupyter)
+#   watcher.latest                            # the newest table as a DataFrame
+#   watcher.stop()
+#
+#   python league_table.py                    # print changes to the Premier League table
+
+import asyncio
+import hashlib
+import inspect
+import time
+from collections import namedtuple
+
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+
+import fetch
+
+BBC_URL = "https://www.bbc.com/sport/football/premier-league/table"
+INTERVAL = 30
+
+# kind is 'added', 'removed' or 'changed'; before and after are the row as a dict (None when
+# the row didn't exist), columns lists the columns that differ
+RowChange = namedtuple('RowChange', ['team', 'kind', 'before', 'after', 'columns'])
+
+
+# The first <table>...</table> of a page, found without parsing the page
+def table_region(page):
+    start = page.find('<table')
+    end = page.find('</table>', start)
+    if start < 0 or end < 0:
+        return None
+    return page[start:end + len('</table>')]
+
+
+def region_hash(region):
+    return hashlib.sha1(region.encode('utf-8')).hexdigest()
+
+
+def team_column(df):
+    for column in df.columns:
+        if 'team' in column.lower():
+            return column
+    return None
+
+
+# Parse a league table into a DataFrame with Position first (as fetch_premier_league_table did)
+def parse_table(region):
+    table = BeautifulSoup(region, 'html.parser').find('table')
+    if not table or not table.find('thead') or not table.find('tbody'):
+        return None
+    headers = [th.get_text(strip=True) for th in table.find('thead').find_all('th')]
+    rows = []
+    for row in table.find('tbody').find_all('tr'):
+        cols = [td.get_text(strip=True) for td in row.find_all(['th', 'td'])]
+        if len(cols) == len(headers):
+            rows.append(dict(zip(headers, cols)))
+    df = pd.DataFrame(rows, columns=headers)
+
+    # Split the position off the team name
+    team_col = team_column(df)
+    if team_col:
+        df.insert(0, 'Position', df[team_col].str.extract(r'^(\d+)', expand=False).astype(int))
+        df[team_col] = df[team_col].str.replace(r'^\d+\.?\s*', '', regex=True)
+    return df
+
+
+# Row-level differences between two tables, matching rows on the team column
+def diff_tables(old, new):
+    key = team_column(new)
+    old_rows = {} if old is None else {row[key]: row for row in old.to_dict(orient='records')}
+    new_rows = {row[key]: row for row in new.to_dict(orient='records')}
+
+    changes = []
+    for team, row in new_rows.items():
+        before = old_rows.get(team)
+        if before is None:
+            changes.append(RowChange(team, 'added', None, row, list(row)))
+        elif before != row:
+            changes.append(RowChange(team, 'changed', before, row, [column for column in row if before.get(column) != row[column]]))
+    for team, row in old_rows.items():
+        if team not in new_rows:
+            changes.append(RowChange(team, 'removed', row, None, list(row)))
+    return changes
+
+
+def print_changes(changes):
+    for change in changes:
+        if change.kind == 'changed':
+            details = ', '.join(f"{column} {change.before[column]} -> {change.after[column]}" for column in change.columns)
+            print(f"{change.team}: {details}")
+        else:
+            print(f"{change.team}: {change.kind}")
+
+
+class TableWatcher:
+    def __init__(self, url=BBC_URL, interval=INTERVAL, fetcher=None):
+        self.url = url
+        self.interval = interval
+        self.fetcher = fetcher or fetch.default_fetcher()
+        self.latest = None
+        self.latest_hash = None
+        self.updated_at = None
+        self.checked_at = None
+        self.subscribers = []
+        self.queues = []
+        self.task = None
+
+    # callback(changes) is called after every change; it may be a coroutine function
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    # A queue that receives each list of changes
+    def queue(self, maxsize=0):
+        changes = asyncio.Queue(maxsize)
+        self.queues.append(changes)
+        return changes
+
+    # Check the page once. Returns the changes (empty when nothing in the table changed).
+    async def poll(self):
+        # max_age=0 always revalidates, so an unchanged page comes back as a cached 304
+        response = await self.fetcher.aget(self.url, max_age=0)
+        self.checked_at = time.time()
+
+        # A 304 doesn't mean the table is the one we have: the cache is shared, so another caller may
+        # have revalidated the page and stored a newer body first. The table hash decides.
+        region = table_region(response.text)
+        if region is None:
+            raise ValueError(f"No table on {self.url}")
+        digest = region_hash(region)
+        if digest == self.latest_hash:
+            return []
+
+        table = parse_table(region)
+        if table is None or team_column(table) is None:
+            raise ValueError(f"Could not read the league table on {self.url}")
+        changes = diff_tables(self.latest, table)
+        self.latest, self.latest_hash, self.updated_at = table, digest, self.checked_at
+        if changes:
+            await self.publish(changes)
+        return changes
+
+    async def publish(self, changes):
+        for callback in list(self.subscribers):
+            try:
+                result = callback(changes)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Error in league table subscriber {callback!r}: {e}")
+        for changes_queue in self.queues:
+            changes_queue.put_nowait(changes)
+
+    # Poll every interval seconds until stopped. Failed polls are reported and retried.
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll()
+            except (requests.RequestException, ValueError) as e:
+                print(f"Error polling {self.url}: {e}")
+            await asyncio.sleep(max(0, self.interval - (time.monotonic() - started)))
+
+    # Run in the background of an already running event loop (scripts use asyncio.run(watcher.run()))
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return self.task
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+
+if __name__ == "__main__":
+    watcher = TableWatcher()
+    watcher.subscribe(print_changes)
+    try:
+        asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        pass
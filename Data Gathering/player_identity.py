@@ -0,0 +1,262 @@
+# Player identity resolution across StatsBomb, FBREF and Transfermarkt
+#
+# Names for the same player differ between sources ("Vinicius Junior", "Vinícius Júnior",
+# "Vinícius José Paixão de Oliveira Júnior") so joining them on exact strings misses players,
+# and fuzzy matching every name against every other name is O(n²). Instead, names are first
+# grouped into blocks by cheap keys (Soundex codes and three letter prefixes of pairs of name
+# tokens), candidates born more than a year apart are dropped, and only the remaining pairs
+# are fuzzy scored. Matching names share a stable player_id, and the registry can be saved and
+# extended with new names later without changing the ids it has already given out.
+#
+# Usage:
+#   registry = PlayerRegistry()
+#   fbref['player_id'] = registry.resolve(fbref, name='Player', birth_year='Born', source='fbref')
+#   events['player_id'] = registry.resolve(events, name='player_name', source='statsbomb')
+#   registry.save('player_registry.parquet')
+
+import hashlib
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz
+
+MATCH_THRESHOLD = 88
+MAX_BLOCK_SIZE = 500
+PARALLEL_MIN_PAIRS = 50_000
+SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(['aeiouyhw', 'bfpv', 'cgjkqsxz', 'dt', 'l', 'mn', 'r']) for c in letters}
+
+
+# Lower case, strip accents and punctuation so "Vinícius Júnior" and "Vinicius Junior" are identical
+def fold_name(name):
+    name = unicodedata.normalize('NFKD', str(name).casefold())
+    name = ''.join(c for c in name if unicodedata.category(c) != 'Mn')
+    return ' '.join(re.sub(r"[^a-z0-9 ]", ' ', name).split())
+
+
+def soundex(token):
+    digits = [SOUNDEX_CODES.get(c, '0') for c in token]
+    code = [token[0]]
+    for previous, digit in zip(digits, digits[1:]):
+        if digit != '0' and digit != previous:
+            code.append(digit)
+    return ''.join(code)[:4].ljust(4, '0')
+
+
+# Keys a name is looked up with: the Soundex codes and prefixes of every pair of its tokens,
+# so a short name still meets the long form it is part of. Single names use their Soundex code.
+def blocking_keys(folded):
+    tokens = folded.split()
+    if len(tokens) == 1:
+        return {('token', soundex(tokens[0]))}
+
+    keys = set()
+    for a, b in combinations(tokens, 2):
+        keys.add(('soundex',) + tuple(sorted((soundex(a), soundex(b)))))
+        keys.add(('prefix',) + tuple(sorted((a[:3], b[:3]))))
+    return keys
+
+
+# Keys a name is stored under, which also lets single names like "Rodri" find it
+def index_keys(folded):
+    return blocking_keys(folded) | {('token', soundex(token)) for token in folded.split()}
+
+
+# Full names are allowed to contain the shorter form ("Jude Bellingham" in "Jude Victor William
+# Bellingham"), but a single name must match the whole of the other name
+def score_names(pairs):
+    return [
+        fuzz.token_set_ratio(a, b) if min(a.count(' '), b.count(' ')) else fuzz.token_sort_ratio(a, b)
+        for a, b in pairs
+    ]
+
+
+# Fuzzy score candidate pairs, spread across all cores when there are many of them
+def score_pairs(pairs, n_jobs=None):
+    if len(pairs) < PARALLEL_MIN_PAIRS:
+        return np.array(score_names(pairs), dtype=np.float32)
+
+    chunk_size = PARALLEL_MIN_PAIRS // 4
+    chunks = [pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)]
+    with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as pool:
+        return np.array([score for scores in pool.map(score_names, chunks) for score in scores], dtype=np.float32)
+
+
+def make_player_id(folded, birth_year):
+    key = f"{folded}|{'' if birth_year is None else birth_year}"
+    return 'P' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:10]
+
+
+def clean_year(value):
+    year = pd.to_numeric(value, errors='coerce')
+    return None if pd.isna(year) else int(year)
+
+
+def clean_nationality(value):
+    return None if pd.isna(value) else fold_name(value)
+
+
+class PlayerRegistry:
+    def __init__(self, threshold=MATCH_THRESHOLD, n_jobs=None):
+        self.threshold = threshold
+        self.n_jobs = n_jobs
+        # One (player_id, name, folded, birth_year, nationality, source) record per distinct spelling
+        self.records = []
+        self.seen = set()
+        self.exact = {}
+        self.ids_by_name = defaultdict(set)
+        self.blocks = defaultdict(list)
+
+    # Return a player_id for every row of df. New names are matched against the registry and
+    # against each other; names with no match above the threshold become new players. Rows
+    # without a name are left out of matching and get pd.NA.
+    def resolve(self, df, name, birth_year=None, nationality=None, source=None):
+        named = df[name].notna().to_numpy()
+        result = pd.Series(pd.NA, index=df.index, name='player_id', dtype=object)
+        df = df[named]
+        rows = pd.DataFrame({
+            'name': df[name].astype(str),
+            'birth_year': df[birth_year].map(clean_year) if birth_year else None,
+            'nationality': df[nationality].map(clean_nationality) if nationality else None
+        }, index=df.index).astype(object)
+        rows = rows.where(rows.notna(), None)
+
+        ids = {}
+        pending = []
+        for row in rows.drop_duplicates().itertuples(index=False):
+            folded = fold_name(row.name)
+            player_id = self.find_exact(folded, row.birth_year)
+            if player_id is None:
+                pending.append((row.name, folded, row.birth_year, row.nationality))
+            else:
+                ids[tuple(row)] = player_id
+                self.add_record(player_id, row.name, folded, row.birth_year, row.nationality, source)
+
+        for record, player_id in zip(pending, self.match_pending(pending)):
+            ids[(record[0], record[2], record[3])] = player_id
+            self.add_record(player_id, *record, source)
+
+        result[named] = [ids[tuple(row)] for row in rows.itertuples(index=False)]
+        return result
+
+    # A name without a year takes the id of the same name with a year (and vice versa) when unambiguous
+    def find_exact(self, folded, birth_year):
+        if (folded, birth_year) in self.exact:
+            return self.exact[(folded, birth_year)]
+        if birth_year is None:
+            candidates = self.ids_by_name.get(folded, ())
+            return next(iter(candidates)) if len(candidates) == 1 else None
+        return self.exact.get((folded, None))
+
+    def add_record(self, player_id, name, folded, birth_year, nationality, source):
+        if (player_id, name, birth_year, nationality, source) in self.seen:
+            return
+        self.seen.add((player_id, name, birth_year, nationality, source))
+        self.records.append((player_id, name, folded, birth_year, nationality, source))
+
+        if (folded, birth_year) not in self.exact:
+            self.exact[(folded, birth_year)] = player_id
+            self.ids_by_name[folded].add(player_id)
+            for key in index_keys(folded):
+                self.blocks[key].append(len(self.records) - 1)
+
+    def candidate_pairs(self, pending):
+        pending_blocks = defaultdict(list)
+        for i, record in enumerate(pending):
+            for key in index_keys(record[1]):
+                pending_blocks[key].append(i)
+
+        existing_pairs, new_pairs = set(), set()
+        for i, record in enumerate(pending):
+            for key in blocking_keys(record[1]):
+                existing = self.blocks.get(key, ())
+                if len(existing) <= MAX_BLOCK_SIZE:
+                    existing_pairs.update((i, j) for j in existing)
+                others = pending_blocks.get(key, ())
+                if len(others) <= MAX_BLOCK_SIZE:
+                    new_pairs.update((min(i, j), max(i, j)) for j in others if j != i)
+
+        return sorted(existing_pairs), sorted(new_pairs)
+
+    def match_pending(self, pending):
+        existing_pairs, new_pairs = self.candidate_pairs(pending)
+        existing_pairs, existing_scores = self.score_candidates(pending, existing_pairs, [record[1:5] for record in self.records])
+        new_pairs, new_scores = self.score_candidates(pending, new_pairs, pending)
+
+        # The best match already in the registry keeps its id, so existing ids never change
+        best = {}
+        for (i, j), score in zip(existing_pairs, existing_scores):
+            if score >= self.threshold and score > best.get(i, (0, None))[0]:
+                best[i] = (score, self.records[j][0])
+
+        # The remaining new names are clustered among themselves with a union-find
+        parent = list(range(len(pending)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for (i, j), score in zip(new_pairs, new_scores):
+            if score >= self.threshold:
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+
+        clusters = defaultdict(list)
+        for i in range(len(pending)):
+            clusters[find(i)].append(i)
+
+        ids = [None] * len(pending)
+        for members in clusters.values():
+            matched = [best[i] for i in members if i in best]
+            if matched:
+                cluster_id = max(matched)[1]
+            else:
+                # Named after the alphabetically first member, so ids don't depend on input order
+                founder = min(members, key=lambda i: (pending[i][1], pending[i][2] or 0))
+                cluster_id = make_player_id(pending[founder][1], pending[founder][2])
+            for i in members:
+                ids[i] = best[i][1] if i in best else cluster_id
+        return ids
+
+    # Drop candidates born more than a year apart, then score the names and adjust for
+    # birth year and nationality when both sides know them
+    def score_candidates(self, pending, pairs, others):
+        years = np.array([np.nan if r[2] is None else r[2] for r in pending], dtype=np.float64)
+        other_years = np.array([np.nan if r[2] is None else r[2] for r in others], dtype=np.float64)
+        if not pairs:
+            return [], np.array([], dtype=np.float32)
+
+        left, right = np.array(pairs).T
+        year_gap = np.abs(years[left] - other_years[right])
+        keep = ~(year_gap > 1)
+        left, right, year_gap = left[keep], right[keep], year_gap[keep]
+
+        scores = score_pairs([(pending[i][1], others[j][1]) for i, j in zip(left, right)], self.n_jobs)
+        scores[year_gap == 1] -= 5
+        nationality_clash = [
+            bool(pending[i][3] and others[j][3] and pending[i][3] != others[j][3]) for i, j in zip(left, right)
+        ]
+        scores[np.array(nationality_clash, dtype=bool)] -= 10
+        return list(zip(left.tolist(), right.tolist())), scores
+
+    def to_frame(self):
+        return pd.DataFrame(self.records, columns=['player_id', 'name', 'folded', 'birth_year', 'nationality', 'source'])
+
+    def save(self, path):
+        self.to_frame().astype({'birth_year': 'Int32'}).to_parquet(path, index=False)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        registry = cls(**kwargs)
+        records = pd.read_parquet(path).astype(object)
+        for row in records.where(records.notna(), None).itertuples(index=False):
+            registry.add_record(row.player_id, row.name, row.folded, row.birth_year, row.nationality, row.source)
+        return registry
@@ -0,0 +1,182 @@
+# Season-partitioned player dataset store
+#
+# premier_league_players.csv and final_all_european_players.csv are rebuilt by concatenating
+# every season and rewriting the whole file, even when only the current season changed.
+# This store keeps player-season rows as a Parquet dataset with one partition per league and
+# season (League=.../Season=.../part-0.parquet). Each partition remembers a hash of the rows
+# it was built from, so ingesting again only rewrites the partitions whose data changed, and
+# readers can load just the leagues, seasons and columns they need. Partitions that drop out of
+# the input (a season deleted from the source, a checkpoint file removed) are deleted too.
+#
+# Usage:
+#   store = PlayerStore('player_store')
+#   store.ingest(pd.read_csv('../data/premier_league_players.csv'), league='Premier League')
+#   store.ingest_files(Path('fbref_seasons').glob('season_*.csv'), league='Premier League')
+#   df = store.read(seasons=['2023-2024', '2024-2025'], columns=['Player', 'Squad'])
+#
+#   python player_store.py player_store ../data/premier_league_players.csv --league "Premier League"
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+PARTITION_COLUMNS = ['League', 'Season']
+
+
+def partition_hash(df):
+    # Hash the rows in a fixed order, so the same data always gives the same hash
+    ordered = df.sort_values(list(df.columns), kind='mergesort').reset_index(drop=True)
+    row_hashes = pd.util.hash_pandas_object(ordered, index=False).to_numpy()
+    columns = ','.join(f'{name}:{dtype}' for name, dtype in ordered.dtypes.items())
+    return hashlib.sha256(columns.encode('utf-8') + row_hashes.tobytes()).hexdigest()
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PlayerStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self.manifest_path = self.root / 'manifest.json'
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        try:
+            return json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            return {'partitions': {}, 'files': {}}
+
+    def save_manifest(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.manifest, indent=1, sort_keys=True))
+        os.replace(tmp_path, self.manifest_path)
+
+    def partition_dir(self, league, season):
+        return self.root / f'League={league}' / f'Season={season}'
+
+    # Group rows into {'league/season': rows} partitions
+    def split(self, df, league=None):
+        if league is not None:
+            df = df.assign(League=league)
+        missing = [column for column in PARTITION_COLUMNS if column not in df.columns]
+        if missing:
+            raise ValueError(f"Player rows need {', '.join(missing)} (pass league= for single-league files)")
+        return {f'{league_name}/{season}': part.drop(columns=PARTITION_COLUMNS).reset_index(drop=True)
+                for (league_name, season), part in df.groupby(PARTITION_COLUMNS, sort=False)}
+
+    # Rewrite the partitions whose content changed, returning them as (league, season)
+    def write(self, parts):
+        written = []
+        for key, part in parts.items():
+            digest = partition_hash(part)
+            if self.manifest['partitions'].get(key, {}).get('hash') == digest:
+                continue
+
+            path = self.partition_dir(*key.split('/', 1)) / 'part-0.parquet'
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            part.to_parquet(tmp_path, index=False, compression='zstd')
+            os.replace(tmp_path, path)
+
+            self.manifest['partitions'][key] = {'hash': digest, 'rows': len(part), 'ingested_at': time.time()}
+            written.append(tuple(key.split('/', 1)))
+        return written
+
+    # Delete partitions (and their then empty directories) so readers no longer see them
+    def remove(self, keys):
+        removed = []
+        for key in sorted(keys):
+            season_dir = self.partition_dir(*key.split('/', 1))
+            (season_dir / 'part-0.parquet').unlink(missing_ok=True)
+            for directory in (season_dir, season_dir.parent):
+                if directory.exists() and not any(directory.iterdir()):
+                    directory.rmdir()
+            self.manifest['partitions'].pop(key, None)
+            removed.append(tuple(key.split('/', 1)))
+        return removed
+
+    # Split rows into league/season partitions and rewrite only those whose content changed.
+    # The rows are the whole input for their leagues: seasons of those leagues that are no
+    # longer in it are removed. Returns the (league, season) partitions that were written.
+    def ingest(self, df, league=None):
+        parts = self.split(df, league)
+        written = self.write(parts)
+        leagues = {key.split('/', 1)[0] for key in parts}
+        self.remove(key for key in list(self.manifest['partitions'])
+                    if key.split('/', 1)[0] in leagues and key not in parts)
+        self.save_manifest()
+        return written
+
+    # Ingest source files (e.g. the per-season checkpoints from fbref_seasons.py), skipping files
+    # that haven't changed since the last run without even reading them. The paths are the whole
+    # input: partitions that only came from files no longer given (or no longer in a changed
+    # file) are removed.
+    def ingest_files(self, paths, league=None, read=pd.read_csv):
+        paths = sorted(Path(p).resolve() for p in paths)
+        files = self.manifest['files']
+        written, stale = [], set()
+        for path in paths:
+            digest = file_hash(path)
+            entry = files.get(str(path))
+            if isinstance(entry, dict) and entry['hash'] == digest:
+                continue
+            parts = self.split(read(path), league)
+            written += self.write(parts)
+            if isinstance(entry, dict):
+                stale.update(entry['partitions'])
+            files[str(path)] = {'hash': digest, 'partitions': sorted(parts)}
+            self.save_manifest()
+
+        for name in set(files) - {str(path) for path in paths}:
+            entry = files.pop(name)
+            if isinstance(entry, dict):
+                stale.update(entry['partitions'])
+        current = {key for entry in files.values() if isinstance(entry, dict) for key in entry['partitions']}
+        self.remove(stale - current)
+        self.save_manifest()
+        return written
+
+    def partitions(self):
+        return sorted(tuple(key.split('/', 1)) for key in self.manifest['partitions'])
+
+    # Lazy view of the whole store; nothing is read until it is scanned
+    def dataset(self):
+        partitioning = ds.partitioning(pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS]), flavor='hive')
+        return ds.dataset(self.root, format='parquet', partitioning=partitioning, exclude_invalid_files=True)
+
+    # Load only the requested leagues, seasons and columns. Unneeded partitions are never opened.
+    def read(self, leagues=None, seasons=None, columns=None):
+        if not self.manifest['partitions']:
+            return pd.DataFrame(columns=columns)
+
+        condition = None
+        for field, values in (('League', leagues), ('Season', seasons)):
+            if values is not None:
+                clause = ds.field(field).isin([str(value) for value in values])
+                condition = clause if condition is None else condition & clause
+        return self.dataset().to_table(columns=columns, filter=condition).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest player-season CSVs into the partitioned player store")
+    parser.add_argument('root', help="Store directory")
+    parser.add_argument('files', nargs='+', help="CSV files with Player, Squad, ... and Season columns")
+    parser.add_argument('--league', help="League for files without a League column")
+    args = parser.parse_args()
+
+    store = PlayerStore(args.root)
+    written = store.ingest_files(args.files, league=args.league)
+    print(f"Rewrote {len(written)} partitions: {written}" if written else "No partitions changed")
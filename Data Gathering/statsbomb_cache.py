@@ -0,0 +1,251 @@
+# Local cache for StatsBomb open data (statsbombpy and mplsoccer's Sbopen)
+#
+# sb.events, sb.matches, sb.competitions and Sbopen.event download the same JSON from the
+# open-data repository every time they are called. This wraps them with a two-level disk cache:
+# the raw JSON responses are stored gzip-compressed with a sha256 checksum, and the parsed
+# frames are stored per match_id (also checksummed), so repeat runs cost one disk read per
+# match. Files from a local clone of https://github.com/statsbomb/open-data are read directly,
+# and offline=True never touches the network.
+#
+# Usage:
+#   from statsbomb_cache import sb, Sbopen
+#   matches = sb.matches(competition_id=11, season_id=27)
+#   df = sb.events(match_id=3754134)
+#   df, related, freeze, tactics = Sbopen().event(3754134)
+#
+#   STATSBOMB_OPEN_DATA=~/open-data STATSBOMB_OFFLINE=1 jupyter lab
+
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from importlib.metadata import version
+from pathlib import Path
+
+import requests
+from mplsoccer import Sbopen as _Sbopen
+from statsbombpy import public
+from statsbombpy import sb as _sb
+
+import fetch
+
+CACHE_DIR = Path(os.environ.get('STATSBOMB_CACHE', Path.home() / '.cache' / 'statsbomb'))
+OPEN_DATA_DIR = os.environ.get('STATSBOMB_OPEN_DATA')
+OFFLINE = os.environ.get('STATSBOMB_OFFLINE', '') not in ('', '0')
+OPEN_DATA_URL = 'https://raw.githubusercontent.com/statsbomb/open-data/master/data/'
+# GitHub's raw file host copes with far more than the scraped sites
+RATE_LIMITS = {'raw.githubusercontent.com': 0.1}
+# Competitions and fixtures are updated as new matches are released; events never change
+LISTING_MAX_AGE = 7 * 24 * 60 * 60
+
+# Parsed frames are rebuilt when the parsing library changes
+PARSER_VERSIONS = f"statsbombpy-{version('statsbombpy')}_mplsoccer-{version('mplsoccer')}"
+
+# statsbombpy fetches through one module-level function, which is pointed at the cache while it parses
+_statsbombpy_lock = threading.Lock()
+
+
+class OfflineError(LookupError):
+    pass
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+class StatsBombCache:
+    def __init__(self, root=CACHE_DIR, open_data=OPEN_DATA_DIR, offline=OFFLINE, fetcher=None, base_url=OPEN_DATA_URL):
+        self.root = Path(root).expanduser()
+        self.base_url = base_url
+        self.open_data = self.find_data_dir(open_data)
+        self.offline = offline
+        self.fetcher = fetcher
+        self.fetcher_lock = threading.Lock()
+
+    # Accept either the root of an open-data clone or its data/ folder
+    @staticmethod
+    def find_data_dir(open_data):
+        if not open_data:
+            return None
+        path = Path(open_data).expanduser()
+        return path / 'data' if (path / 'data').is_dir() else path
+
+    def get_fetcher(self):
+        with self.fetcher_lock:
+            if self.fetcher is None:
+                # No HTTP cache: the compressed copies below are the cache
+                self.fetcher = fetch.Fetcher(cache_dir=None, rate_limiter=fetch.HostRateLimiter(limits=RATE_LIMITS))
+            return self.fetcher
+
+    # Raw JSON, e.g. raw_json('events/3754134.json'), from the local clone, the cache or the network
+    def raw_json(self, path, max_age=None):
+        return json.loads(self.raw_bytes(path, max_age))
+
+    def raw_bytes(self, path, max_age=None):
+        if self.open_data and (self.open_data / path).is_file():
+            return (self.open_data / path).read_bytes()
+
+        body_path = self.root / 'raw' / f'{path}.gz'
+        cached = self.read_checked(body_path, decompress=True)
+        if cached is not None and (self.offline or max_age is None or time.time() - body_path.stat().st_mtime <= max_age):
+            return cached
+        if self.offline:
+            if cached is not None:
+                return cached
+            raise OfflineError(f"{path} is not in the StatsBomb cache or the local open-data clone")
+
+        try:
+            response = self.get_fetcher().get(self.base_url + path)
+        except requests.RequestException:
+            # A stale copy beats no data when GitHub can't be reached
+            if cached is not None:
+                return cached
+            raise
+        self.write_checked(body_path, response.content, compress=True)
+        return response.content
+
+    # Files are written with a .sha256 sidecar holding the checksum of their (uncompressed) content.
+    # A file that fails the check is treated as missing.
+    def read_checked(self, path, decompress=False):
+        try:
+            expected = path.with_name(path.name + '.sha256').read_text().strip()
+            data = path.read_bytes()
+            if decompress:
+                data = gzip.decompress(data)
+        except (OSError, EOFError, zlib.error):
+            return None
+        if sha256(data) != expected:
+            print(f"Discarding corrupt cache file {path}")
+            return None
+        return data
+
+    def write_checked(self, path, data, compress=False):
+        write_atomic(path, gzip.compress(data, compresslevel=6) if compress else data)
+        write_atomic(path.with_name(path.name + '.sha256'), sha256(data).encode('ascii'))
+
+    # Parsed frames are pickled (StatsBomb columns hold lists and dicts that pickle keeps intact)
+    # under frames/<parser versions>/<name>.pkl.gz
+    def frames_path(self, name):
+        return self.root / 'frames' / PARSER_VERSIONS / f'{name}.pkl.gz'
+
+    # Cached frames, or None if they are missing, corrupt or older than max_age
+    def load_frames(self, name, max_age=None):
+        path = self.frames_path(name)
+        if max_age is None or self.offline or (path.exists() and time.time() - path.stat().st_mtime <= max_age):
+            data = self.read_checked(path, decompress=True)
+            if data is not None:
+                return pickle.loads(data)
+        return None
+
+    def store_frames(self, name, frames):
+        self.write_checked(self.frames_path(name), pickle.dumps(frames, protocol=pickle.HIGHEST_PROTOCOL), compress=True)
+
+    def cached_frames(self, name, build, max_age=None):
+        frames = self.load_frames(name, max_age)
+        if frames is None:
+            frames = build()
+            self.store_frames(name, frames)
+        return frames
+
+    def listing_response(self, url):
+        return self.raw_json(url[len(OPEN_DATA_URL):], max_age=LISTING_MAX_AGE)
+
+    def competitions(self):
+        def build():
+            with statsbombpy_source(self.listing_response) as sb:
+                return sb.competitions()
+        return self.cached_frames('competitions', build, LISTING_MAX_AGE)
+
+    def matches(self, competition_id, season_id):
+        def build():
+            with statsbombpy_source(self.listing_response) as sb:
+                return sb.matches(competition_id=competition_id, season_id=season_id)
+        return self.cached_frames(f'matches/{competition_id}/{season_id}', build, LISTING_MAX_AGE)
+
+    # Parsed events for one match in the format of one of EVENT_PARSERS. Keyword arguments are
+    # passed to the parser and frames parsed with them are cached separately.
+    def match_events(self, match_id, parser='statsbombpy', **kwargs):
+        name, parse = EVENT_PARSERS[parser]
+        if kwargs:
+            name += '-' + sha256(json.dumps(kwargs, sort_keys=True, default=str).encode('utf-8'))[:16]
+        return self.cached_frames(f'{name}/{match_id}',
+                                  lambda: parse(match_id, self.raw_json(f'events/{match_id}.json'), **kwargs))
+
+    # sb.events, including its split, filters, fmt and flatten_attrs arguments
+    def events(self, match_id, **kwargs):
+        return self.match_events(match_id, 'statsbombpy', **kwargs)
+
+    # mplsoccer's Sbopen.event: (events, related events, freeze frames, tactics)
+    def sbopen_event(self, match_id):
+        return self.match_events(match_id, 'sbopen')
+
+
+# Run a statsbombpy call with its downloads answered by get_response(url) instead of HTTP
+@contextmanager
+def statsbombpy_source(get_response):
+    with _statsbombpy_lock:
+        original = public.get_response
+        public.get_response = get_response
+        try:
+            yield _sb
+        finally:
+            public.get_response = original
+
+
+def parse_statsbombpy_events(match_id, data, **kwargs):
+    with statsbombpy_source(lambda url: data) as sb:
+        return sb.events(match_id=match_id, **kwargs)
+
+
+# Sbopen that parses JSON it has already been given
+class _LoadedSbopen(_Sbopen):
+    def __init__(self, data):
+        super().__init__()
+        self.data = data
+
+    def _get_data(self, url):
+        return self.data
+
+
+def parse_sbopen_event(match_id, data):
+    return _LoadedSbopen(data).event(match_id)
+
+
+# Cache folder and parse function for each event format
+EVENT_PARSERS = {
+    'statsbombpy': ('events', parse_statsbombpy_events),
+    'sbopen': ('sbopen_events', parse_sbopen_event)
+}
+
+
+# Sbopen with its downloads (and, by default, its parsed frames) served from a StatsBombCache
+class CachedSbopen(_Sbopen):
+    def __init__(self, cache=None, dataframe=True, cache_frames=True):
+        super().__init__(dataframe=dataframe)
+        self.cache = cache or sb
+        self.cache_frames = cache_frames and dataframe
+
+    def _get_data(self, url):
+        return self.cache.raw_json(url[len(self.url):])
+
+    def event(self, match_id):
+        if self.cache_frames:
+            return self.cache.sbopen_event(match_id)
+        return super().event(match_id)
+
+
+# Drop-in replacements for `from statsbombpy import sb` and `from mplsoccer import Sbopen`
+sb = StatsBombCache()
+Sbopen = CachedSbopen
@@ -0,0 +1,95 @@
+# Flat, typed columns from statsbombpy event frames
+#
+# sb.events leaves coordinates as Python lists in object columns (location, pass_end_location,
+# carry_end_location, shot_end_location) and nests lineups and freeze frames as lists of dicts,
+# so the analysis code split them with .apply(pd.Series) and loops over tactics dicts, building
+# a Series per event. Here every nested field is unpacked in one pass over the column into
+# float32 NumPy arrays (NaN where an event has no value), and lineups and freeze frames become
+# long frames with one row per player.
+#
+# Usage:
+#   df = normalize_events(sb.events(match_id=69249))   # adds x, y, pass_end_x, ..., shot_end_z
+#   jersey_numbers = lineups(df)[['player_id', 'jersey_number']]
+#   ff = freeze_frames(df)
+
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+# Coordinate columns and the flat columns they are unpacked into
+COORDINATE_COLUMNS = {
+    'location': ['x', 'y'],
+    'pass_end_location': ['pass_end_x', 'pass_end_y'],
+    'carry_end_location': ['carry_end_x', 'carry_end_y'],
+    'shot_end_location': ['shot_end_x', 'shot_end_y', 'shot_end_z'],
+    'goalkeeper_end_location': ['goalkeeper_end_x', 'goalkeeper_end_y']
+}
+
+
+def is_sequence(value):
+    return isinstance(value, (list, tuple, np.ndarray))
+
+
+# Unpack a column of coordinate lists into an (n, width) float32 array. Missing values and
+# missing trailing coordinates (shot_end_location only sometimes has a height) are NaN.
+def coordinates(values, width=2):
+    values = np.asarray(values, dtype=object)
+    present = np.fromiter(map(is_sequence, values), dtype=bool, count=len(values))
+    items = values[present]
+    lengths = np.fromiter(map(len, items), dtype=np.intp, count=len(items))
+    flat = np.fromiter(chain.from_iterable(items), dtype=np.float32, count=lengths.sum())
+
+    out = np.full((len(values), width), np.nan, dtype=np.float32)
+    rows = np.repeat(np.flatnonzero(present), lengths)
+    columns = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    keep = columns < width
+    out[rows[keep], columns[keep]] = flat[keep]
+    return out
+
+
+# Add flat float32 x/y columns for every coordinate column in the frame
+def normalize_events(df):
+    flat = {}
+    for column, names in COORDINATE_COLUMNS.items():
+        if column in df.columns:
+            array = coordinates(df[column].to_numpy(), width=len(names))
+            flat.update({name: array[:, i] for i, name in enumerate(names)})
+    return df.assign(**flat)
+
+
+# One row per player in each Starting XI / Tactical Shift event's tactics.lineup
+def lineups(df):
+    tactics = df.loc[df['tactics'].notna(), ['id', 'team', 'tactics']] if 'tactics' in df.columns else df.iloc[:0]
+    lineup_lists = [t.get('lineup', []) for t in tactics['tactics']] if len(tactics) else []
+    lengths = np.fromiter(map(len, lineup_lists), dtype=np.intp, count=len(lineup_lists))
+    players = list(chain.from_iterable(lineup_lists))
+
+    return pd.DataFrame({
+        'event_id': np.repeat(tactics['id'].to_numpy(), lengths),
+        'team': np.repeat(tactics['team'].to_numpy(), lengths),
+        'formation': np.repeat(np.array([t.get('formation') for t in tactics['tactics']], dtype=object), lengths),
+        'player_id': np.array([p['player']['id'] for p in players], dtype=np.int64),
+        'player_name': [p['player']['name'] for p in players],
+        'position': [p['position']['name'] for p in players],
+        'jersey_number': np.array([p['jersey_number'] for p in players], dtype=np.int16)
+    })
+
+
+# One row per player visible in each shot's freeze frame
+def freeze_frames(df):
+    shots = df.loc[df['shot_freeze_frame'].notna(), ['id', 'shot_freeze_frame']] if 'shot_freeze_frame' in df.columns else df.iloc[:0]
+    frames = list(shots['shot_freeze_frame']) if len(shots) else []
+    lengths = np.fromiter(map(len, frames), dtype=np.intp, count=len(frames))
+    players = list(chain.from_iterable(frames))
+    location = coordinates([p.get('location') for p in players])
+
+    return pd.DataFrame({
+        'event_id': np.repeat(shots['id'].to_numpy(), lengths),
+        'x': location[:, 0],
+        'y': location[:, 1],
+        'player_id': np.array([p['player']['id'] for p in players], dtype=np.int64),
+        'player_name': [p['player']['name'] for p in players],
+        'position': [p['position']['name'] for p in players],
+        'teammate': np.array([p['teammate'] for p in players], dtype=bool)
+    })
@@ -0,0 +1,102 @@
+# Load StatsBomb events for many matches in parallel
+#
+# The per-match loops in the xThreat, squad value and World Cup notebooks fetch, parse and
+# process one match at a time, so a 380 match season spends most of its time waiting on
+# downloads and JSON parsing on a single core. Here downloads (or cache reads) run on a thread
+# pool and parsing runs on a process pool, and each match is handed back as soon as it is
+# ready. A match that fails is reported and skipped without stopping the others. Everything
+# goes through statsbomb_cache, so parsed matches are stored for the next run.
+#
+# Usage:
+#   for match_id, (df, related, freeze, tactics) in iter_events(match_ids, progress=print_progress):
+#       ...
+#   df = load_events(match_ids, parser='statsbombpy')   # one frame, in match_ids order
+
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+import statsbomb_cache
+
+IO_WORKERS = 8
+
+MatchEvents = namedtuple('MatchEvents', ['match_id', 'frames'])
+
+
+def print_progress(done, total, match_id, error=None):
+    print(f"\r{done}/{total} matches", end='\n' if done == total else '', flush=True)
+
+
+def print_error(match_id, error):
+    print(f"Error retrieving data for match {match_id}: {error}")
+
+
+# Runs on the thread pool: parsed frames from the cache if they are there, else the raw JSON
+def read_match(cache, parser, match_id):
+    name, _ = statsbomb_cache.EVENT_PARSERS[parser]
+    frames = cache.load_frames(f'{name}/{match_id}')
+    if frames is not None:
+        return frames, None
+    return None, cache.raw_bytes(f'events/{match_id}.json')
+
+
+# Runs on the process pool: parse the raw JSON and store the frames for next time
+def parse_match(cache_root, parser, match_id, raw):
+    name, parse = statsbomb_cache.EVENT_PARSERS[parser]
+    frames = parse(match_id, json.loads(raw))
+    statsbomb_cache.StatsBombCache(root=cache_root).store_frames(f'{name}/{match_id}', frames)
+    return frames
+
+
+# Yield MatchEvents(match_id, frames) in the order matches finish. frames is what
+# Sbopen().event returns for parser='sbopen', or the sb.events frame for parser='statsbombpy'.
+def iter_events(match_ids, parser='sbopen', cache=None, io_workers=IO_WORKERS, parse_workers=None,
+                progress=None, on_error=print_error):
+    cache = cache or statsbomb_cache.sb
+    match_ids = list(dict.fromkeys(match_ids))
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=io_workers) as io_pool, \
+            ProcessPoolExecutor(max_workers=parse_workers or os.cpu_count()) as parse_pool:
+        reading = {io_pool.submit(read_match, cache, parser, match_id): match_id for match_id in match_ids}
+        parsing = {}
+        try:
+            while reading or parsing:
+                finished, _ = wait([*reading, *parsing], return_when=FIRST_COMPLETED)
+                for future in finished:
+                    error = future.exception()
+                    if future in reading:
+                        match_id = reading.pop(future)
+                        if error is None:
+                            frames, raw = future.result()
+                            # Not cached yet: parse it on the process pool and pick it up when that finishes
+                            if frames is None:
+                                parsing[parse_pool.submit(parse_match, str(cache.root), parser, match_id, raw)] = match_id
+                                continue
+                    else:
+                        match_id = parsing.pop(future)
+                        if error is None:
+                            frames = future.result()
+
+                    done += 1
+                    if progress:
+                        progress(done, len(match_ids), match_id, error)
+                    if error is not None:
+                        if on_error:
+                            on_error(match_id, error)
+                        continue
+                    yield MatchEvents(match_id, frames)
+        finally:
+            # Stopped early: don't start matches nobody will read
+            for future in [*reading, *parsing]:
+                future.cancel()
+
+
+# All matches' events in one frame (the events frame for parser='sbopen'), in match_ids order
+def load_events(match_ids, parser='sbopen', **kwargs):
+    results = {match.match_id: match.frames for match in iter_events(match_ids, parser=parser, **kwargs)}
+    frames = [results[match_id][0] if parser == 'sbopen' else results[match_id] for match_id in match_ids if match_id in results]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
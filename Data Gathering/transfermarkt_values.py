@@ -0,0 +1,136 @@
+# Transfermarkt market values for a list of players, scraped concurrently
+#
+# Replaces the serial search loop with a fixed time.sleep(2) between players. Searches run on
+# asyncio behind fetch's per-host rate limit for transfermarkt.com (one request every 2
+# seconds), shared with every other scraper in the process. That limit, not the concurrency,
+# sets the pace: a first run over ~1,200 players takes about 40 minutes, as the old loop did;
+# the few concurrent searches only hide each response's latency. What changes is the rerun:
+# players already in the output CSV are skipped and searches are cached for a day. Failed
+# requests are retried by the fetcher's session (backoff on 429 and 5xx, honouring
+# Retry-After), every result is appended to a CSV as soon as it arrives (so an interrupted
+# run resumes where it stopped), and the market value is read with a regex over the raw HTML
+# instead of building a full BeautifulSoup tree.
+#
+# Usage:
+#   df = scrape_market_values(['Rodri', 'Vinicius Junior'], output='market_values.csv')
+#   df = await scrape_market_values_async(players)   # inside Jupyter, where an event loop is already running
+
+import asyncio
+import csv
+import html
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import requests
+
+import fetch
+
+SEARCH_URL = "https://www.transfermarkt.com/schnellsuche/ergebnis/schnellsuche"
+# Searches in flight at once; a few are enough to overlap response times with the rate limit's waits
+CONCURRENCY = 4
+RETRIES = 3
+RESULT_COLUMNS = ['Player', 'Market Value', 'market_value_eur', 'status', 'error']
+
+MARKET_VALUE_PATTERN = re.compile(r'<td[^>]*class="rechts hauptlink"[^>]*>(.*?)</td>', re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+MULTIPLIERS = {'k': 1e3, 'th.': 1e3, 'm': 1e6, 'bn': 1e9}
+
+
+# The market value of the first search result, e.g. "€180.00m", or None if there isn't one
+def extract_market_value(page):
+    match = MARKET_VALUE_PATTERN.search(page)
+    if not match:
+        return None
+    return html.unescape(TAG_PATTERN.sub('', match.group(1))).strip() or None
+
+
+# Convert a Transfermarkt value such as "€180.00m", "€500k" or "€1.20bn" to euros
+def parse_market_value(value):
+    if not isinstance(value, str):
+        return np.nan
+    match = re.fullmatch(r'€?\s*([\d.,]+)\s*(bn|m|k|th\.)?', value.strip().lower())
+    if not match:
+        return np.nan
+    return float(match.group(1).replace(',', '')) * MULTIPLIERS.get(match.group(2), 1)
+
+
+# The fetcher's session does the retrying (once per URL). Its rate limiter is the default
+# fetcher's, so transfermarkt.com requests from other scrapers count against the same limit.
+def make_fetcher(retries=RETRIES):
+    return fetch.Fetcher(retries=retries, rate_limiter=fetch.default_fetcher().rate_limiter)
+
+
+async def search_market_value(fetcher, player, search_url=SEARCH_URL):
+    try:
+        # Cached for a day, so re-running a batch only hits the network for new players
+        response = await fetcher.aget(search_url, params={'query': player}, max_age=24 * 60 * 60)
+    except requests.RequestException as e:
+        return {'Player': player, 'Market Value': 'Error: ' + str(e), 'market_value_eur': np.nan, 'status': 'error', 'error': str(e)}
+    market_value = extract_market_value(response.text)
+    return {
+        'Player': player,
+        'Market Value': market_value or 'Not Found',
+        'market_value_eur': parse_market_value(market_value),
+        'status': 'ok' if market_value else 'not_found',
+        'error': ''
+    }
+
+
+def read_finished(output):
+    if output is None or not Path(output).exists():
+        return {}
+    done = pd.read_csv(output, dtype={'Player': str})
+    done = done[done['status'] != 'error']
+    return {row['Player']: row for row in done.to_dict(orient='records')}
+
+
+def to_frame(results):
+    df = pd.DataFrame(results, columns=RESULT_COLUMNS)
+    return df.astype({
+        'Player': 'string',
+        'Market Value': 'string',
+        'market_value_eur': 'float64',
+        'status': pd.CategoricalDtype(['ok', 'not_found', 'error']),
+        'error': 'string'
+    })
+
+
+async def scrape_market_values_async(players, output=None, concurrency=CONCURRENCY, retries=RETRIES, fetcher=None, search_url=SEARCH_URL):
+    players = [player for player in dict.fromkeys(players) if isinstance(player, str)]
+    fetcher = fetcher or make_fetcher(retries)
+    results = read_finished(output)
+    todo = [player for player in players if player not in results]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def scrape(player):
+        async with semaphore:
+            return await search_market_value(fetcher, player, search_url)
+
+    writer_file = None
+    if output is not None:
+        new_file = not Path(output).exists()
+        writer_file = open(output, 'a', newline='', encoding='utf-8')
+        writer = csv.DictWriter(writer_file, fieldnames=RESULT_COLUMNS)
+        if new_file:
+            writer.writeheader()
+
+    try:
+        # Write each result as soon as it arrives rather than when the whole batch is done
+        for i, task in enumerate(asyncio.as_completed([scrape(player) for player in todo]), start=1):
+            result = await task
+            results[result['Player']] = result
+            print(f"{i}/{len(todo)}: {result['Player']} - {result['Market Value']}")
+            if writer_file:
+                writer.writerow(result)
+                writer_file.flush()
+    finally:
+        if writer_file:
+            writer_file.close()
+
+    return to_frame([results[player] for player in players])
+
+
+def scrape_market_values(players, **kwargs):
+    return asyncio.run(scrape_market_values_async(players, **kwargs))
@@ -0,0 +1,425 @@
+# Bulk Understat ingestion: matches, players and shots for every league and season
+#
+# The Understat notebook built a BeautifulSoup tree of the whole league page to reach one
+# <script> tag, sliced the JSON out of it by hand and only did it for the EPL's current
+# season. Understat embeds its data as `var name = JSON.parse('...')` blobs, so here every
+# blob is cut straight out of the page text and decoded, without building a DOM.
+# League pages give the fixtures (datesData) and season player totals (playersData), and each
+# played match's page gives its shots (shotsData). Pages are fetched concurrently through the
+# shared fetcher (cached on disk, and under fetch's understat.com limit of one request a second
+# for every scraper in the process, so parsing overlaps the waiting rather than speeding up the
+# requests), and every table is written as a typed Parquet dataset with one partition per league
+# and season (<table>/League=EPL/Season=2023/part-0.parquet). A season with shots is about 380
+# match pages, so the first full backfill takes several hours; finished seasons already on disk
+# are skipped, so it resumes where it stopped and later runs only fetch the current season.
+#
+# Usage:
+#   python understat.py understat_data                                   # every league and season
+#   python understat.py understat_data --leagues EPL --seasons 2023 2024 --no-shots
+#
+#   data = extract_json_vars(fetch.get('https://understat.com/league/EPL').text)
+#   matches = matches_frame(data['datesData'])
+#   shots = read('understat_data', 'shots', leagues=['EPL'], seasons=[2023])
+#
+#   python understat.py --benchmark           # blob extraction and ingestion on a synthetic local site
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import requests
+
+import fetch
+
+BASE_URL = 'https://understat.com/'
+LEAGUES = ['EPL', 'La_liga', 'Bundesliga', 'Serie_A', 'Ligue_1', 'RFPL']
+FIRST_SEASON = 2014
+TABLES = ['matches', 'players', 'shots']
+CONCURRENCY = 8
+# League pages for the season in progress are refetched after an hour
+CURRENT_MAX_AGE = 60 * 60
+
+BENCHMARK_LEAGUES = ['EPL', 'La_liga']
+BENCHMARK_SEASONS = [2022, 2023]
+
+BLOB_START = "JSON.parse('"
+BLOB_END = "')"
+VAR_NAME_PATTERN = re.compile(r'var\s+(\w+)\s*=\s*$')
+
+# Output column -> (path into the Understat JSON, dtype)
+MATCH_COLUMNS = {
+    'id': (('id',), 'Int64'),
+    'is_result': (('isResult',), 'boolean'),
+    'datetime': (('datetime',), 'datetime64[ns]'),
+    'h_id': (('h', 'id'), 'Int32'),
+    'h_title': (('h', 'title'), 'category'),
+    'h_short_title': (('h', 'short_title'), 'category'),
+    'a_id': (('a', 'id'), 'Int32'),
+    'a_title': (('a', 'title'), 'category'),
+    'a_short_title': (('a', 'short_title'), 'category'),
+    'goals_h': (('goals', 'h'), 'Int16'),
+    'goals_a': (('goals', 'a'), 'Int16'),
+    'xG_h': (('xG', 'h'), 'float64'),
+    'xG_a': (('xG', 'a'), 'float64'),
+    'forecast_w': (('forecast', 'w'), 'float64'),
+    'forecast_d': (('forecast', 'd'), 'float64'),
+    'forecast_l': (('forecast', 'l'), 'float64')
+}
+
+PLAYER_COLUMNS = {
+    'id': (('id',), 'Int64'),
+    'player_name': (('player_name',), 'string'),
+    'team_title': (('team_title',), 'category'),
+    'position': (('position',), 'category'),
+    'games': (('games',), 'Int16'),
+    'time': (('time',), 'Int32'),
+    'goals': (('goals',), 'Int16'),
+    'xG': (('xG',), 'float64'),
+    'assists': (('assists',), 'Int16'),
+    'xA': (('xA',), 'float64'),
+    'shots': (('shots',), 'Int16'),
+    'key_passes': (('key_passes',), 'Int16'),
+    'yellow_cards': (('yellow_cards',), 'Int16'),
+    'red_cards': (('red_cards',), 'Int16'),
+    'npg': (('npg',), 'Int16'),
+    'npxG': (('npxG',), 'float64'),
+    'xGChain': (('xGChain',), 'float64'),
+    'xGBuildup': (('xGBuildup',), 'float64')
+}
+
+SHOT_COLUMNS = {
+    'id': (('id',), 'Int64'),
+    'match_id': (('match_id',), 'Int64'),
+    'date': (('date',), 'datetime64[ns]'),
+    'minute': (('minute',), 'Int16'),
+    'h_a': (('h_a',), 'category'),
+    'h_team': (('h_team',), 'category'),
+    'a_team': (('a_team',), 'category'),
+    'h_goals': (('h_goals',), 'Int16'),
+    'a_goals': (('a_goals',), 'Int16'),
+    'player_id': (('player_id',), 'Int64'),
+    'player': (('player',), 'string'),
+    'player_assisted': (('player_assisted',), 'string'),
+    'X': (('X',), 'float64'),
+    'Y': (('Y',), 'float64'),
+    'xG': (('xG',), 'float64'),
+    'result': (('result',), 'category'),
+    'situation': (('situation',), 'category'),
+    'shotType': (('shotType',), 'category'),
+    'lastAction': (('lastAction',), 'category')
+}
+
+
+# Understat seasons are named after the year they start in; a new one starts in July
+def current_season(today=None):
+    today = today or datetime.date.today()
+    return today.year if today.month >= 7 else today.year - 1
+
+
+def league_url(league, season, base_url=BASE_URL):
+    return f'{base_url}league/{league}/{season}'
+
+
+def match_url(match_id, base_url=BASE_URL):
+    return f'{base_url}match/{match_id}'
+
+
+def is_escaped(text, position):
+    backslashes = 0
+    while position > backslashes and text[position - backslashes - 1] == '\\':
+        backslashes += 1
+    return backslashes % 2 == 1
+
+
+# (name, string literal) for every `var name = JSON.parse('...')` in a page. The blobs make up
+# most of the page, so their ends are found with str.find rather than a regex stepping through
+# every character: Understat escapes quotes as \x27, so the first unescaped "')" closes the blob.
+def json_parse_blobs(page):
+    position = 0
+    while True:
+        call = page.find(BLOB_START, position)
+        if call < 0:
+            return
+        start = call + len(BLOB_START)
+        end = page.find(BLOB_END, start)
+        while end >= 0 and is_escaped(page, end):
+            end = page.find(BLOB_END, end + 1)
+        if end < 0:
+            return
+        name = VAR_NAME_PATTERN.search(page, max(0, call - 100), call)
+        if name:
+            yield name.group(1), page[start:end]
+        position = end + len(BLOB_END)
+
+
+# Every JSON.parse blob in a page, decoded. The blobs are JavaScript string literals with \xNN
+# escapes; latin-1 + backslashreplace turns any non-Latin characters into escapes too, so
+# unicode_escape decodes the whole thing in one C call without mangling accented names.
+def extract_json_vars(page):
+    return {
+        name: json.loads(blob.encode('latin-1', 'backslashreplace').decode('unicode_escape'))
+        for name, blob in json_parse_blobs(page)
+    }
+
+
+def lookup(record, path):
+    value = record
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+# Typed table from a list of Understat records. Understat sends numbers as strings.
+def to_frame(records, columns):
+    data = {}
+    for name, (path, dtype) in columns.items():
+        values = pd.Series([lookup(record, path) for record in records], dtype=object)
+        if dtype == 'boolean':
+            data[name] = values.astype('boolean')
+        elif dtype.startswith('datetime'):
+            data[name] = pd.to_datetime(values, errors='coerce')
+        elif dtype in ('category', 'string'):
+            data[name] = values.astype('string').astype(dtype)
+        else:
+            data[name] = pd.to_numeric(values, errors='coerce').astype(dtype)
+    return pd.DataFrame(data)
+
+
+def matches_frame(dates_data):
+    return to_frame(dates_data, MATCH_COLUMNS)
+
+
+def players_frame(players_data):
+    return to_frame(players_data, PLAYER_COLUMNS)
+
+
+# shotsData holds the home ('h') and away ('a') shots separately
+def shots_frame(shots_data_list):
+    return to_frame([shot for shots_data in shots_data_list for side in ('h', 'a') for shot in shots_data.get(side, [])], SHOT_COLUMNS)
+
+
+def partition_path(root, table, league, season):
+    return Path(root) / table / f'League={league}' / f'Season={season}' / 'part-0.parquet'
+
+
+def write_partition(df, root, table, league, season):
+    path = partition_path(root, table, league, season)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    df.to_parquet(tmp_path, index=False, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+# Load one table, reading only the requested leagues, seasons and columns
+def read(root, table, leagues=None, seasons=None, columns=None):
+    path = Path(root) / table
+    if not path.exists():
+        return pd.DataFrame(columns=columns)
+    partitioning = ds.partitioning(pa.schema([('League', pa.string()), ('Season', pa.int32())]), flavor='hive')
+    dataset = ds.dataset(path, format='parquet', partitioning=partitioning, exclude_invalid_files=True)
+
+    condition = None
+    for field, values in (('League', leagues), ('Season', seasons)):
+        if values is not None:
+            clause = ds.field(field).isin(list(values))
+            condition = clause if condition is None else condition & clause
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+class Ingester:
+    def __init__(self, root, tables=TABLES, concurrency=CONCURRENCY, fetcher=None, base_url=BASE_URL, season_now=None):
+        self.root = Path(root)
+        self.tables = list(tables)
+        self.fetcher = fetcher or fetch.default_fetcher()
+        self.base_url = base_url
+        self.season_now = current_season() if season_now is None else season_now
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def get_vars(self, url, max_age=None):
+        async with self.semaphore:
+            response = await self.fetcher.aget(url, max_age=max_age)
+        return extract_json_vars(response.text)
+
+    # A finished season is done once all its tables are on disk; the current one is always refreshed
+    def is_done(self, league, season):
+        return season < self.season_now and all(partition_path(self.root, table, league, season).exists() for table in self.tables)
+
+    async def ingest_season(self, league, season):
+        max_age = CURRENT_MAX_AGE if season >= self.season_now else None
+        data = await self.get_vars(league_url(league, season, self.base_url), max_age=max_age)
+        if 'datesData' not in data:
+            raise ValueError(f"No datesData on the {league} {season} page")
+
+        matches = matches_frame(data['datesData'])
+        written = {}
+        if 'matches' in self.tables:
+            written['matches'] = matches
+        if 'players' in self.tables:
+            written['players'] = players_frame(data.get('playersData', []))
+
+        if 'shots' in self.tables:
+            # Played match pages don't change, so they are cached for good and only new matches are fetched
+            match_ids = matches.loc[matches['is_result'].fillna(False), 'id'].dropna().astype(int).tolist()
+            results = await asyncio.gather(*[self.get_vars(match_url(match_id, self.base_url)) for match_id in match_ids],
+                                           return_exceptions=True)
+            failed = [match_id for match_id, result in zip(match_ids, results) if isinstance(result, Exception) or 'shotsData' not in result]
+            if failed:
+                # Leave the shots partition out so the next run tries again
+                print(f"{league} {season}: no shots for {len(failed)} matches (e.g. {failed[0]}), run again to retry")
+            else:
+                written['shots'] = shots_frame([result['shotsData'] for result in results])
+
+        for table, df in written.items():
+            write_partition(df, self.root, table, league, season)
+        return {table: len(df) for table, df in written.items()}
+
+    async def run(self, leagues=LEAGUES, seasons=None):
+        seasons = list(seasons) if seasons is not None else list(range(FIRST_SEASON, self.season_now + 1))
+        todo = [(league, season) for league in leagues for season in seasons if not self.is_done(league, season)]
+        print(f"{len(leagues) * len(seasons) - len(todo)} league seasons already ingested, {len(todo)} to go")
+
+        async def ingest(league, season):
+            try:
+                return league, season, await self.ingest_season(league, season)
+            except (requests.RequestException, ValueError) as e:
+                return league, season, e
+
+        for i, task in enumerate(asyncio.as_completed([ingest(league, season) for league, season in todo]), start=1):
+            league, season, result = await task
+            summary = f"Error: {result}" if isinstance(result, Exception) else ', '.join(f'{n} {table}' for table, n in result.items())
+            print(f"{i}/{len(todo)} {league} {season}: {summary}")
+
+
+def ingest(root, leagues=LEAGUES, seasons=None, tables=TABLES, **kwargs):
+    return asyncio.run(Ingester(root, tables=tables, **kwargs).run(leagues, seasons))
+
+
+# Understat-style page: each variable as an escaped JSON.parse blob among filler markup
+def synthetic_page(variables):
+    filler = '<div class="block">' + 'lorem ipsum ' * 20 + '</div>\n'
+    page = '<html><head><title>Understat</title></head><body>' + filler * 400
+    for name, value in variables.items():
+        text = json.dumps(value, ensure_ascii=False)
+        blob = ''.join(c if c.isalnum() or ord(c) > 127 else f'\\x{ord(c):02X}' for c in text)
+        page += f"<script>\n\tvar {name}\t= JSON.parse('{blob}');\n</script>\n" + filler * 20
+    return page + '</body></html>'
+
+
+# League pages (380 fixtures, 550 players) and a match page with shots for every played match,
+# laid out as league/<league>/<season> and match/<id> under directory. The last season is half played.
+def synthetic_site(directory, leagues=BENCHMARK_LEAGUES, seasons=BENCHMARK_SEASONS, seed=1):
+    rng = random.Random(seed)
+    directory = Path(directory)
+    names = ['Martin Ødegaard', "N'Golo Kanté", 'Son Heung-Min', 'Kevin De Bruyne', 'Erling Haaland', 'Bruno Fernandes']
+    match_id = 10000
+    for league in leagues:
+        for season in seasons:
+            teams = [{'id': str(80 + i), 'title': f'Team {i}', 'short_title': f'T{i:02d}'} for i in range(20)]
+            dates = []
+            for k in range(380):
+                match_id += 1
+                home, away = rng.sample(teams, 2)
+                match = {'id': str(match_id), 'isResult': season < seasons[-1] or k < 190, 'h': home, 'a': away,
+                         'datetime': f'{season}-08-{1 + k % 28:02d} 15:00:00',
+                         'goals': {'h': None, 'a': None}, 'xG': {'h': None, 'a': None}}
+                if match['isResult']:
+                    match.update(goals={'h': str(rng.randint(0, 4)), 'a': str(rng.randint(0, 3))},
+                                 xG={'h': f'{rng.random() * 3:.5f}', 'a': f'{rng.random() * 2:.5f}'},
+                                 forecast={'w': '0.5', 'd': '0.3', 'l': '0.2'})
+                    shots = {side: [{
+                        'id': str(rng.randint(1, 10 ** 7)), 'minute': str(rng.randint(1, 90)),
+                        'result': rng.choice(['Goal', 'SavedShot', 'MissedShots']), 'X': f'{rng.random():.3f}',
+                        'Y': f'{rng.random():.3f}', 'xG': f'{rng.random() / 3:.6f}', 'player': rng.choice(names),
+                        'h_a': side, 'player_id': str(rng.randint(1, 9999)), 'situation': 'OpenPlay', 'season': str(season),
+                        'shotType': 'RightFoot', 'match_id': str(match_id), 'h_team': home['title'], 'a_team': away['title'],
+                        'h_goals': match['goals']['h'], 'a_goals': match['goals']['a'], 'date': match['datetime'],
+                        'player_assisted': rng.choice(names + [None]), 'lastAction': 'Pass'
+                    } for _ in range(rng.randint(5, 15))] for side in 'ha'}
+                    path = directory / 'match' / str(match_id)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_text(synthetic_page({'shotsData': shots, 'match_info': {'id': str(match_id)}}), encoding='utf-8')
+                dates.append(match)
+            players = [{
+                'id': str(i), 'player_name': f'{names[i % len(names)]} {i}', 'games': str(rng.randint(1, 38)),
+                'time': str(rng.randint(1, 3420)), 'goals': '3', 'xG': '2.817', 'assists': '1', 'xA': '0.9', 'shots': '20',
+                'key_passes': '9', 'yellow_cards': '2', 'red_cards': '0', 'position': rng.choice(['F S', 'M S', 'D']),
+                'team_title': f'Team {i % 20}', 'npg': '3', 'npxG': '2.5', 'xGChain': '4.1', 'xGBuildup': '1.2'
+            } for i in range(550)]
+            path = directory / 'league' / league / str(season)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(synthetic_page({'datesData': dates, 'teamsData': {team['id']: team for team in teams},
+                                            'playersData': players}), encoding='utf-8')
+
+
+# The notebook's way to one blob: a BeautifulSoup tree of the page, then the second <script>
+def soup_blob(page):
+    import bs4
+
+    strings = bs4.BeautifulSoup(page, 'lxml').find_all('script')[1].string
+    blob = strings[strings.index("('") + 2:strings.index("')")]
+    return json.loads(blob.encode('utf8').decode('unicode_escape'))
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# Time blob extraction against the notebook's BeautifulSoup path on a synthetic league page,
+# then a full ingestion of the synthetic site from a local server (and a re-run from the cache)
+def benchmark(repeat=20):
+    from fixture_server import FixtureServer
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        site = Path(tmp_dir) / 'site'
+        synthetic_site(site)
+        page = (site / 'league' / BENCHMARK_LEAGUES[0] / str(BENCHMARK_SEASONS[-1])).read_text(encoding='utf-8')
+        blobs = best_time(lambda: extract_json_vars(page), repeat)
+        soup = best_time(lambda: soup_blob(page), repeat)
+        print(f"{len(page.encode('utf-8')) / 1e6:.1f} MB league page: {blobs * 1000:.1f} ms to extract all "
+              f"{len(extract_json_vars(page))} blobs, {soup * 1000:.1f} ms with BeautifulSoup for one")
+
+        n_pages = sum(1 for path in site.rglob('*') if path.is_file())
+        with FixtureServer(directory=site) as server:
+            fetcher = fetch.Fetcher(cache_dir=Path(tmp_dir) / 'cache', rate_limiter=fetch.HostRateLimiter(limits={}, default=0))
+            for run in ('first run', 're-run'):
+                start = time.perf_counter()
+                ingest(Path(tmp_dir) / 'data', BENCHMARK_LEAGUES, BENCHMARK_SEASONS, fetcher=fetcher,
+                       base_url=server.url('/'), season_now=BENCHMARK_SEASONS[-1])
+                print(f"Ingesting {len(BENCHMARK_LEAGUES) * len(BENCHMARK_SEASONS)} league seasons ({n_pages} pages), "
+                      f"{run}: {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest Understat matches, players and shots into a partitioned Parquet dataset")
+    parser.add_argument('root', nargs='?', help="Output directory")
+    parser.add_argument('--leagues', nargs='+', default=LEAGUES, choices=LEAGUES)
+    parser.add_argument('--seasons', nargs='+', type=int, help=f"Starting years of the seasons (default: {FIRST_SEASON} to the current one)")
+    parser.add_argument('--no-shots', action='store_true', help="Skip the match pages (one request per match)")
+    parser.add_argument('--benchmark', action='store_true', help="Benchmark on a synthetic site served locally instead")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    elif args.root is None:
+        parser.error("the output directory is required")
+    else:
+        start = time.perf_counter()
+        ingest(args.root, args.leagues, args.seasons, tables=[table for table in TABLES if not (args.no_shots and table == 'shots')])
+        print(f"Finished in {time.perf_counter() - start:.1f}s")
@@ -1,5 +1,10 @@
+import sys
 import pandas as pd
 
+# Fetch FBref pages through the shared fetch layer, which rate limits and caches them on disk
+sys.path.append('../Data Gathering')
+import fetch
+
 # Define dates for data set 
 dates = pd.date_range(start='1/1/2018', end='5/31/2024', freq='YS')
 
@@ -10,10 +15,12 @@ for date in dates:
     season_end = date.year + 1
     season = f'{season_start}-{season_end}'
     print(season)
-    df = pd.read_html(f'https://fbref.com/en/comps/12/{season}/schedule/{season}-La-Liga-Scores-and-Fixtures', attrs={"id": f"sched_{season}_12_1"})[0]
+    # Finished seasons never change, so only the latest one is re-checked (at most daily)
+    max_age = None if season_start < dates[-1].year else 24 * 60 * 60
+    df = fetch.read_html(f'https://fbref.com/en/comps/12/{season}/schedule/{season}-La-Liga-Scores-and-Fixtures', attrs={"id": f"sched_{season}_12_1"}, max_age=max_age)[0]
     all_dfs.append(df)
     
-    df2 = pd.read_html(f'https://fbref.com/en/comps/9/{season}/schedule/{season}-Premier-League-Scores-and-Fixtures', attrs={"id": f"sched_{season}_9_1"})[0]
+    df2 = fetch.read_html(f'https://fbref.com/en/comps/9/{season}/schedule/{season}-Premier-League-Scores-and-Fixtures', attrs={"id": f"sched_{season}_9_1"}, max_age=max_age)[0]
     all_dfs.append(df2)
 
 # Concatenate all dfs together
@@ -1,5 +1,8 @@
 import pandas as pd
 
+from match_features import rolling_form
+from team_state import TeamState
+
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -38,38 +41,19 @@ df = pd.get_dummies(df, columns=['Day'])
 df.reset_index(drop=True, inplace=True)
 df.sort_values(['Date'], inplace=True)
 
-# Create a temporary df with all matches for a certain team (either at home or away)
-for x in df.Home.unique():
-    temp_df = df[(df['Home'] == x) | (df['Away'] == x)]
-    temp_df = temp_df.sort_values(['Date'])
-# Ensure the correct goal value is being calculated depending whether a team is at home or away    
-    temp_df['goal_value_to_calculate'] = temp_df.apply(lambda y: y['home_goals'] if y['Home'] == x else y['away_goals'], axis=1)
-# Calculate the rolling average of goals of the last five matches  
-    temp_df['rolling_avg_goals'] = temp_df['goal_value_to_calculate'].rolling(window=5, closed="left", min_periods=1).mean()
-# Apply the rolling average of goals to the original df    
-    for index, row in temp_df.iterrows():
-        if row['Home'] == x:
-            df.at[index, 'home_rolling_avg_goals'] = row['rolling_avg_goals']
-        else:
-            df.at[index, 'away_rolling_avg_goals'] = row['rolling_avg_goals']
+# Rolling averages of goals and xG over each team's previous five matches (home or away), in one
+# pass over a team-by-match view of the fixtures. closed="left" keeps the match itself out of its own average.
+df = df.join(rolling_form(df, metrics=['goals', 'xG'], windows=[5]))
+
+# Save each team's last five matches, so new matchweeks can be added with TeamState.update
+# (and upcoming fixtures featurised with TeamState.features) without rerunning this script
+team_state = TeamState(metrics=['goals', 'xG'], window=5)
+team_state.update(df)
+team_state.save('~/Documents/GitHub/Football/team_state.npz')
 
 #Check the rolling goal average variable using Chelsea as an example
 df[(df['Home'] == 'Chelsea') | (df['Away'] == 'Chelsea')][['Wk', 'Date', 'Home', 'Away', 'home_goals', 'away_goals','home_rolling_avg_goals', 'away_rolling_avg_goals']]
 
-#Replicate the same model but for xG
-for x in df.Home.unique():
-    temp_df = df[(df['Home'] == x) | (df['Away'] == x)]
-    temp_df = temp_df.sort_values(['Date'])
-    
-    temp_df['xG_value_to_calculate'] = temp_df.apply(lambda y: y['xG'] if y['Home'] == x else y['xG.1'], axis=1)
-    temp_df['rolling_avg_xG'] = temp_df['xG_value_to_calculate'].rolling(window=5, closed="left", min_periods=1).mean()
-    
-    for index, row in temp_df.iterrows():
-        if row['Home'] == x:
-            df.at[index, 'home_rolling_avg_xG'] = row['rolling_avg_xG']
-        else:
-            df.at[index, 'away_rolling_avg_xG'] = row['rolling_avg_xG']
-
 # Drop the rows where the rolling averages are null because a lack of historic data
 df = df.dropna(subset=['home_rolling_avg_goals', 'away_rolling_avg_goals', 'home_rolling_avg_xG', 'away_rolling_avg_xG'])
 
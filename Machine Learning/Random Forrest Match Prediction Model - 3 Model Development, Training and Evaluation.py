@@ -28,21 +28,24 @@ accuracy
 confusion_matrix(y_test, predictions)
 
 
-# Tune the hyperparameters
-from sklearn.model_selection import GridSearchCV
+# Tune the hyperparameters. Candidates are scored on time-ordered folds (train on earlier
+# matches, test on later ones), weak ones are dropped on a small slice of the data, and fold
+# scores are cached so a rerun or a bigger grid only fits what's new
+from model_search import BudgetedSearch, time_splits
 
 param_grid = {
     'n_estimators': [50, 100, 200],
     'max_depth': [5, 10, 15, 20]
 }
 
-grid_search = GridSearchCV(estimator=clf, param_grid=param_grid, cv=5)
+grid_search = BudgetedSearch(estimator=clf, param_grid=param_grid, cv=time_splits(train_data['Date']),
+                             report_path='~/Documents/GitHub/Football/search_report.json')
 grid_search.fit(X_train, y_train)
 
 grid_search.best_params_
 
 # Using the recommendations of the best hyperparameters, train the new model
-clf = RandomForestClassifier(random_state=1, n_estimators=200, max_depth=5)
+clf = RandomForestClassifier(random_state=1, **grid_search.best_params_)
 clf.fit(X_train, y_train)
 
 # Make new predictions and evaluate model accuracy
@@ -50,30 +53,37 @@ predictions = clf.predict(X_test)
 accuracy = accuracy_score(y_test, predictions)
 accuracy
 
-# Create binary variables for home, away, referee and venue
-df = pd.get_dummies(df, columns=['Home', 'Away', 'Referee', 'Venue'])
+# Create binary variables for home, away, referee and venue. They are encoded as a sparse matrix
+# (the same columns pd.get_dummies made, mostly zeros) with a saved vocabulary for new matches
+from match_encoding import CategoryEncoder
 
+categorical = ['Home', 'Away', 'Referee', 'Venue']
 
 # Define the features and target variable
-features = [column for column in df.drop(columns=['Date', 'xG', 'xG.1', 'Score', 'result', 'home_goals', 'away_goals', 'season_start']).columns]
+numeric_features = [column for column in df.drop(columns=['Date', 'xG', 'xG.1', 'Score', 'result', 'home_goals', 'away_goals', 'season_start'] + categorical).columns]
+encoder = CategoryEncoder(categorical).fit(df, numeric_features)
+encoder.save('~/Documents/GitHub/Football/match_categories.json')
+features = encoder.feature_names()
 
 # Split the data into new train and test sets
 train_data = df[df['season_start'] <= 2022]
 test_data = df[df['season_start'] == 2023]
 
-X_train = train_data[features]
+X_train = encoder.transform(train_data)
 y_train = train_data['result']
-X_test = test_data[features]
+X_test = encoder.transform(test_data)
 y_test = test_data['result']
 
 # Find the best hyperparameters for the new Random Forest model
-grid_search = GridSearchCV(estimator=clf, param_grid=param_grid, cv=5)
+grid_search = BudgetedSearch(estimator=RandomForestClassifier(random_state=1), param_grid=param_grid,
+                             cv=time_splits(train_data['Date']),
+                             report_path='~/Documents/GitHub/Football/search_report_encoded.json')
 grid_search.fit(X_train, y_train)
 
 grid_search.best_params_
 
 # Train a Random Forest model with the new features and hyperparameters 
-clf = RandomForestClassifier(random_state=1, n_estimators=50, max_depth=15)
+clf = RandomForestClassifier(random_state=1, **grid_search.best_params_)
 clf.fit(X_train, y_train)
 
 # Make predictions and evaluate model
@@ -81,22 +91,44 @@ predictions = clf.predict(X_test)
 accuracy = accuracy_score(y_test, predictions)
 accuracy
 
+# Check the model on every season rather than only 2023: retrain before each season on all the
+# earlier matches and predict it (step='matchweek' retrains every week), scored per league
+from backtest import match_leagues, summarise, walk_forward
+
+predictions = walk_forward(encoder.transform(df), df['result'], df.assign(League=match_leagues(df)),
+                           RandomForestClassifier(random_state=1, **grid_search.best_params_), step='season')
+summary, calibration = summarise(predictions)
+summary
+
 # Test the model by creating a row of data with has features which represent a hypothetical match.
 match = {
-    'Wk': [25],
-    'home_rolling_avg_goals': [1.9],
-    'away_rolling_avg_goals': [1.2],
-    'home_rolling_avg_xG': [2.1],
-    'away_rolling_avg_xG': [1.3],
-    'Day_Saturday': [1],
-    'Home_Chelsea': [1],
-    'Away_Manchester Utd': [1],
-    'Referee_Anthony Taylor': [1],
-    'Venue_Stamford Bridge': [1]
+    'Wk': 25,
+    'home_rolling_avg_goals': 1.9,
+    'away_rolling_avg_goals': 1.2,
+    'home_rolling_avg_xG': 2.1,
+    'away_rolling_avg_xG': 1.3,
+    'Day_Saturday': 1,
+    'Home': 'Chelsea',
+    'Away': 'Manchester Utd',
+    'Referee': 'Anthony Taylor',
+    'Venue': 'Stamford Bridge'
 }
 
-#For all other binary variables return 0 values intead of null
-match = pd.DataFrame(columns=X_train.columns, data=data)
+#Encode just this row with the saved vocabulary (all other binary variables are 0)
+X_match = encoder.encode_records([match])
 
 #Predict match outcome!
-match.fillna(0, inplace=True)
+dict(zip(clf.classes_, clf.predict_proba(X_match)[0]))
+
+# Save the model with its feature schema. match_service loads it with the saved team state and
+# predicts whole matchweeks at once (python match_service.py serves it over HTTP)
+from match_service import MatchPredictor, save_model
+
+save_model(clf, encoder, '~/Documents/GitHub/Football/match_model.joblib')
+predictor = MatchPredictor.load('~/Documents/GitHub/Football/match_model.joblib', '~/Documents/GitHub/Football/team_state.npz')
+
+# The same hypothetical match gives the same prediction, and with only a date the rolling
+# averages and day come from each team's latest matches in the team state
+predictor.predict([match])
+predictor.predict([{'Wk': 25, 'Date': '2024-02-17', 'Home': 'Chelsea', 'Away': 'Manchester Utd', 'Referee': 'Anthony Taylor', 'Venue': 'Stamford Bridge'},
+                   {'Wk': 25, 'Date': '2024-02-17', 'Home': 'Arsenal', 'Away': 'Burnley', 'Referee': 'Michael Oliver', 'Venue': 'Emirates Stadium'}])
@@ -0,0 +1,217 @@
+# Walk-forward backtests of the match outcome model
+#
+# Script 3 scores the model on one split (train on seasons up to 2022, test on 2023), so one
+# lucky or unlucky season decides whether a change looks better. The backtest here retrains
+# before every season (or every matchweek) on all the matches played before it and predicts
+# that season, with the folds fitted in parallel worker processes. The feature matrix is built
+# once for the whole history (rolling form only looks at earlier matches, so it holds for every
+# fold), saved to disk keyed by a hash of the CSV and the feature code, and every fold slices
+# its rows out of that one matrix (joblib memory-maps it for the workers when it is large)
+# instead of rebuilding features. Predictions are summarised per league and season as
+# accuracy, log loss and Brier score, plus a calibration table.
+#
+# Usage:
+#   predictions = walk_forward(X, df['result'], df, RandomForestClassifier(random_state=1), step='season')
+#   summary, calibration = summarise(predictions)
+#
+#   python backtest.py MLMatchPrediction.csv --step matchweek
+
+import argparse
+import hashlib
+import inspect
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+
+import match_encoding
+import match_features
+from match_encoding import CategoryEncoder
+from match_features import rolling_form
+
+CACHE_DIR = Path(os.environ.get('FOOTBALL_BACKTEST_CACHE', Path.home() / '.cache' / 'football-backtest'))
+CALIBRATION_BINS = 10
+# A few clubs that identify each league; leagues are found as groups of teams that play each other
+LEAGUE_TEAMS = {
+    'Premier League': ['Arsenal', 'Chelsea', 'Liverpool', 'Manchester City', 'Manchester Utd', 'Tottenham'],
+    'La Liga': ['Real Madrid', 'Barcelona', 'Atlético Madrid', 'Sevilla', 'Valencia', 'Villarreal']
+}
+CATEGORICAL = ['Home', 'Away', 'Referee', 'Venue']
+NON_FEATURES = ['Date', 'xG', 'xG.1', 'Score', 'result', 'home_goals', 'away_goals', 'season_start', 'League']
+
+
+# League of every match. The CSV has no league column, but teams only ever play teams of their
+# own league, so each league is a connected group of teams in the fixture list.
+def match_leagues(df, home='Home', away='Away'):
+    teams = pd.Index(pd.unique(np.concatenate([df[home].to_numpy(), df[away].to_numpy()])))
+    parent = np.arange(len(teams))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(teams.get_indexer(df[home]), teams.get_indexer(df[away])):
+        parent[root(i)] = root(j)
+    groups = np.array([root(i) for i in range(len(teams))])
+
+    names = {}
+    for group in pd.unique(groups):
+        members = set(teams[groups == group])
+        known = [league for league, clubs in LEAGUE_TEAMS.items() if members.intersection(clubs)]
+        names[group] = known[0] if len(known) == 1 else f"League of {min(members)}"
+    return pd.Series([names[group] for group in groups[teams.get_indexer(df[home])]], index=df.index, name='League')
+
+
+# The match table script 2 builds, from the scraped CSV
+def prepare_matches(csv):
+    df = pd.read_csv(csv).dropna(subset=['Score', 'xG', 'xG.1', 'Referee'])
+    df = df.drop(columns=['Attendance', 'Time'], errors='ignore')
+    df[['home_goals', 'away_goals']] = df['Score'].str.split('–', expand=True).astype(float)
+    df['Date'] = pd.to_datetime(df['Date'])
+    df['season_start'] = (df['Date'].dt.year - (df['Date'].dt.month < 8)).astype(np.int64)
+    df['result'] = np.select([df['home_goals'] > df['away_goals'], df['home_goals'] < df['away_goals']],
+                             ['Home win', 'Away win'], 'Draw')
+    df['Day'] = df['Date'].dt.day_name()
+    df = pd.get_dummies(df, columns=['Day'])
+    df = df.reset_index(drop=True).sort_values(['Date'])
+    df = df.join(rolling_form(df, metrics=['goals', 'xG'], windows=[5]))
+    df = df.dropna(subset=['home_rolling_avg_goals', 'away_rolling_avg_goals', 'home_rolling_avg_xG', 'away_rolling_avg_xG'])
+    df['League'] = match_leagues(df)
+    return df
+
+
+# Feature matrix and match table for a CSV, built once and then loaded from the cache
+def load_matches(csv, cache_dir=CACHE_DIR):
+    csv = Path(csv).expanduser()
+    # Keyed by the data and by the code that turns it into features (this whole module, since
+    # leagues, feature columns and the cached table all come from it)
+    digest = hashlib.sha256(csv.read_bytes())
+    for module in (sys.modules[__name__], match_features, match_encoding):
+        digest.update(inspect.getsource(module).encode('utf-8'))
+    digest = digest.hexdigest()[:16]
+    cache_dir = Path(cache_dir).expanduser()
+    matrix_path, table_path = cache_dir / f'{digest}.npz', cache_dir / f'{digest}.pkl'
+    if matrix_path.exists() and table_path.exists():
+        return sparse.load_npz(matrix_path), pd.read_pickle(table_path)
+
+    df = prepare_matches(csv)
+    numeric = [column for column in df.columns if column not in NON_FEATURES + CATEGORICAL]
+    X = CategoryEncoder(CATEGORICAL).fit(df, numeric).transform(df)
+    table = df[['Date', 'Wk', 'Home', 'Away', 'League', 'season_start', 'result']].reset_index(drop=True)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    for path, write in ((matrix_path, lambda f: sparse.save_npz(f, X)), (table_path, table.to_pickle)):
+        tmp_path = path.with_name(f'{path.stem}.{os.getpid()}.tmp{path.suffix}')
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    return X, table
+
+
+# (name, train rows, test rows) for each fold. step='season' retrains before every season,
+# step='matchweek' before every calendar week (Monday to Sunday) of matches.
+def walk_forward_folds(matches, step='season', first_season=None):
+    dates = pd.to_datetime(matches['Date']).to_numpy()
+    seasons = matches['season_start'].to_numpy()
+    first_season = first_season if first_season is not None else np.unique(seasons)[1]
+    folds = []
+    if step == 'season':
+        for season in np.unique(seasons[seasons >= first_season]):
+            folds.append((str(season), np.flatnonzero(seasons < season), np.flatnonzero(seasons == season)))
+    elif step == 'matchweek':
+        weeks = pd.Series(dates).dt.to_period('W').dt.start_time.to_numpy()
+        for week in np.unique(weeks[seasons >= first_season]):
+            test = np.flatnonzero((weeks == week) & (seasons >= first_season))
+            folds.append((str(pd.Timestamp(week).date()), np.flatnonzero(dates < week), test))
+    else:
+        raise ValueError(f"step must be 'season' or 'matchweek', not {step!r}")
+    return [fold for fold in folds if len(fold[1]) and len(fold[2])]
+
+
+def run_fold(estimator, X, y, train, test):
+    model = clone(estimator).fit(X[train], y[train])
+    return model.classes_, model.predict_proba(X[test])
+
+
+# Out-of-sample probabilities for every match after the first season, one row per match with
+# the match details, the fold it was predicted in and a column per outcome
+def walk_forward(X, y, matches, estimator, step='season', first_season=None, n_jobs=-1):
+    matches = matches.reset_index(drop=True)
+    y = np.asarray(y)
+    folds = walk_forward_folds(matches, step, first_season)
+    results = Parallel(n_jobs=n_jobs)(delayed(run_fold)(estimator, X, y, train, test) for _, train, test in folds)
+
+    classes = np.unique(y)
+    parts = []
+    for (name, _, test), (fold_classes, probabilities) in zip(folds, results):
+        # A fold whose training data lacked an outcome gives it probability 0
+        aligned = np.zeros((len(test), len(classes)))
+        aligned[:, np.searchsorted(classes, fold_classes)] = probabilities
+        part = matches.iloc[test][['Date', 'Home', 'Away', 'League', 'season_start']].assign(fold=name, result=y[test])
+        parts.append(part.join(pd.DataFrame(aligned, columns=classes, index=part.index)))
+    return pd.concat(parts)
+
+
+def outcome_columns(predictions):
+    return [column for column in predictions.columns
+            if column not in ('Date', 'Home', 'Away', 'League', 'season_start', 'fold', 'result')]
+
+
+# Accuracy, log loss and multi-class Brier score per league and season (with an 'All' row per
+# league), and a calibration table of predicted against observed frequency per league and outcome
+def summarise(predictions, bins=CALIBRATION_BINS):
+    classes = outcome_columns(predictions)
+    probabilities = predictions[classes].to_numpy()
+    actual = predictions['result'].to_numpy()[:, None] == np.array(classes)[None, :]
+    scores = pd.DataFrame({
+        'League': predictions['League'].to_numpy(),
+        'season_start': predictions['season_start'].astype(str).to_numpy(),
+        'matches': 1,
+        'accuracy': (np.array(classes)[probabilities.argmax(axis=1)] == predictions['result'].to_numpy()).astype(float),
+        'log_loss': -np.log(np.clip(probabilities[actual], 1e-15, 1)),
+        'brier': ((probabilities - actual) ** 2).sum(axis=1)
+    })
+    aggregations = {'matches': 'sum', 'accuracy': 'mean', 'log_loss': 'mean', 'brier': 'mean'}
+    summary = pd.concat([
+        scores.groupby(['League', 'season_start']).agg(aggregations),
+        scores.assign(season_start='All').groupby(['League', 'season_start']).agg(aggregations)
+    ]).sort_index()
+
+    calibration = pd.DataFrame({
+        'League': np.repeat(predictions['League'].to_numpy(), len(classes)),
+        'outcome': np.tile(classes, len(predictions)),
+        'bin': np.minimum((probabilities.ravel() * bins).astype(int), bins - 1),
+        'predicted': probabilities.ravel(),
+        'observed': actual.ravel().astype(float)
+    })
+    calibration = calibration.groupby(['League', 'outcome', 'bin']).agg(
+        matches=('predicted', 'size'), predicted=('predicted', 'mean'), observed=('observed', 'mean'))
+    calibration.index = calibration.index.set_levels(
+        [f'{b / bins:.1f}-{(b + 1) / bins:.1f}' for b in calibration.index.levels[2]], level='bin')
+    return summary, calibration
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the match outcome model")
+    parser.add_argument('csv', help="MLMatchPrediction.csv")
+    parser.add_argument('--step', choices=['season', 'matchweek'], default='season')
+    parser.add_argument('--first-season', type=int, help="First season to predict (default: the second one)")
+    parser.add_argument('--n-estimators', type=int, default=50)
+    parser.add_argument('--max-depth', type=int, default=15)
+    parser.add_argument('--jobs', type=int, default=-1)
+    args = parser.parse_args()
+
+    X, matches = load_matches(args.csv)
+    model = RandomForestClassifier(random_state=1, n_estimators=args.n_estimators, max_depth=args.max_depth)
+    predictions = walk_forward(X, matches['result'], matches, model, args.step, args.first_season, args.jobs)
+    summary, calibration = summarise(predictions)
+    with pd.option_context('display.max_rows', None, 'display.width', 120):
+        print(summary.round(4))
+        print(calibration.round(3))
@@ -0,0 +1,91 @@
+# Sparse one-hot encoding of the categorical match columns with a saved vocabulary
+#
+# pd.get_dummies on Home, Away, Referee and Venue turned four columns into hundreds of dense
+# ones, which GridSearchCV copied for every fold, and predicting a single match meant building
+# a full-width frame and filling it with zeros. CategoryEncoder keeps the categories as a
+# vocabulary (saved as JSON) and encodes rows straight into a SciPy CSR matrix: the numeric
+# features first, then one column per category in the order get_dummies used, so a model
+# sees exactly the same features as before. Categories missing from the vocabulary encode as
+# all zeros, like the old fillna(0).
+#
+# Usage:
+#   encoder = CategoryEncoder(['Home', 'Away', 'Referee', 'Venue']).fit(df, numeric_columns)
+#   X = encoder.transform(df)                        # scipy.sparse.csr_matrix
+#   encoder.save('match_categories.json')
+#   X_match = CategoryEncoder.load('match_categories.json').encode_records([{'Home': 'Chelsea', ...}])
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+CATEGORICAL_COLUMNS = ['Home', 'Away', 'Referee', 'Venue']
+
+
+class CategoryEncoder:
+    def __init__(self, columns=CATEGORICAL_COLUMNS, numeric_columns=None, categories=None, dtype=np.float32):
+        self.columns = list(columns)
+        self.numeric_columns = list(numeric_columns or [])
+        self.categories = categories or {}
+        self.dtype = dtype
+
+    # Learn the categories of each column (sorted, as get_dummies orders them)
+    def fit(self, df, numeric_columns):
+        self.numeric_columns = list(numeric_columns)
+        self.categories = {column: sorted(df[column].dropna().unique().tolist()) for column in self.columns}
+        return self
+
+    def feature_names(self):
+        return self.numeric_columns + [f'{column}_{category}' for column in self.columns for category in self.categories[column]]
+
+    def n_features(self):
+        return len(self.numeric_columns) + sum(len(self.categories[column]) for column in self.columns)
+
+    # Category number of each row in each column (-1 for categories outside the vocabulary)
+    def codes(self, df):
+        return {column: pd.Categorical(df[column], categories=self.categories[column]).codes for column in self.columns}
+
+    def transform(self, df):
+        numeric = df[self.numeric_columns].to_numpy(dtype=self.dtype)
+        rows, cols = np.nonzero(numeric)
+        row_blocks, col_blocks, data_blocks = [rows], [cols], [numeric[rows, cols]]
+
+        offset = len(self.numeric_columns)
+        for column, codes in self.codes(df).items():
+            known = np.flatnonzero(codes >= 0)
+            row_blocks.append(known)
+            col_blocks.append(offset + codes[known].astype(np.int64))
+            data_blocks.append(np.ones(len(known), dtype=self.dtype))
+            offset += len(self.categories[column])
+
+        matrix = sparse.coo_matrix(
+            (np.concatenate(data_blocks), (np.concatenate(row_blocks), np.concatenate(col_blocks))),
+            shape=(len(df), self.n_features())
+        )
+        return matrix.tocsr()
+
+    # Encode plain dicts such as {'Wk': 25, 'Home': 'Chelsea', ...}; numeric features not given are 0
+    def encode_records(self, records):
+        df = pd.DataFrame.from_records(records)
+        df = df.reindex(columns=self.numeric_columns + self.columns)
+        df[self.numeric_columns] = df[self.numeric_columns].fillna(0)
+        return self.transform(df)
+
+    def save(self, path):
+        path = Path(path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_text(json.dumps({
+            'columns': self.columns,
+            'numeric_columns': self.numeric_columns,
+            'categories': self.categories
+        }, indent=1, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        vocabulary = json.loads(Path(path).expanduser().read_text(encoding='utf-8'))
+        return cls(vocabulary['columns'], vocabulary['numeric_columns'], vocabulary['categories'])
@@ -0,0 +1,77 @@
+# Rolling form features for match prediction
+#
+# The feature engineering script looped over every team, picked the team's value out of each
+# of its fixtures with a row-wise apply and wrote the rolling averages back one cell at a
+# time, then did the whole thing again for xG. Here the fixtures are reshaped once into a
+# long table with one row per team per match (goals, goals against, xG, xGA, points from that
+# team's side), every metric and window is rolled in one grouped pass with closed='left' (only
+# matches before the one being predicted), and the result is pivoted back to home_/away_
+# columns on the fixture rows. Adding a metric is one more column in the same pass.
+#
+# Usage:
+#   df = df.join(rolling_form(df, metrics=['goals', 'xG']))        # home_rolling_avg_goals, ...
+#   form = rolling_form(df, metrics=['goals', 'xG', 'xGA', 'points'], windows=[3, 5, 10])
+
+import numpy as np
+import pandas as pd
+
+WINDOW = 5
+# Metric name -> column of the team-match table
+METRICS = {
+    'goals': 'goals_for',
+    'goals_against': 'goals_against',
+    'xG': 'xg_for',
+    'xGA': 'xg_against',
+    'points': 'points'
+}
+
+
+# One row per team per match, from that team's side. match is the fixture's index label.
+def team_matches(df, home='Home', away='Away', date='Date', home_goals='home_goals', away_goals='away_goals',
+                 home_xg='xG', away_xg='xG.1'):
+    n = len(df)
+    home_side = np.repeat([True, False], n)
+    goals_for = np.concatenate([df[home_goals].to_numpy(dtype=float), df[away_goals].to_numpy(dtype=float)])
+    goals_against = np.concatenate([df[away_goals].to_numpy(dtype=float), df[home_goals].to_numpy(dtype=float)])
+
+    return pd.DataFrame({
+        'match': np.tile(df.index.to_numpy(), 2),
+        'is_home': home_side,
+        'team': np.concatenate([df[home].to_numpy(), df[away].to_numpy()]),
+        'opponent': np.concatenate([df[away].to_numpy(), df[home].to_numpy()]),
+        'date': np.tile(df[date].to_numpy(), 2),
+        'goals_for': goals_for,
+        'goals_against': goals_against,
+        'xg_for': np.concatenate([df[home_xg].to_numpy(dtype=float), df[away_xg].to_numpy(dtype=float)]),
+        'xg_against': np.concatenate([df[away_xg].to_numpy(dtype=float), df[home_xg].to_numpy(dtype=float)]),
+        'points': np.select([goals_for > goals_against, goals_for == goals_against], [3.0, 1.0], 0.0)
+    })
+
+
+def feature_name(side, metric, window):
+    name = f'{side}_rolling_avg_{metric}'
+    return name if window == WINDOW else f'{name}_{window}'
+
+
+# Rolling means of each metric over each team's previous `window` matches, as home_/away_
+# columns indexed like df. A team's first match has no history, so its values are NaN.
+def rolling_form(df, metrics=('goals', 'xG'), windows=(WINDOW,), min_periods=1, **columns):
+    long = team_matches(df, **columns).sort_values(['team', 'date'], kind='stable')
+    values = long[[METRICS[metric] for metric in metrics]]
+    grouped = values.groupby(long['team'].to_numpy(), sort=False)
+
+    rolled = {}
+    for window in windows:
+        means = grouped.rolling(window, closed='left', min_periods=min_periods).mean().droplevel(0)
+        for metric in metrics:
+            rolled[(metric, window)] = means[METRICS[metric]]
+    rolled = pd.DataFrame(rolled, index=long.index)
+
+    # Back to one row per fixture: the home rows and away rows side by side
+    home = long['is_home'].to_numpy()
+    match = long['match'].to_numpy()
+    features = {}
+    for (metric, window), column in rolled.items():
+        for side, rows in (('home', home), ('away', ~home)):
+            features[feature_name(side, metric, window)] = pd.Series(column.to_numpy()[rows], index=match[rows])
+    return pd.DataFrame(features).reindex(df.index)
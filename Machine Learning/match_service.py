@@ -0,0 +1,263 @@
+# Batch match outcome predictions from a saved model, feature schema and team state
+#
+# Predicting a fixture used to mean hand-writing a one-row match dict with its rolling averages
+# and day dummies, in the same session that trained the model. save_model stores the fitted
+# classifier together with its feature schema (the CategoryEncoder vocabulary), and
+# MatchPredictor loads it once with the saved TeamState. A whole matchweek (or season) of
+# fixtures is then featurised in one vectorised pass (rolling form from the team state, day
+# dummies from the date, category columns) and scored with a single predict_proba call, a few
+# milliseconds for a matchweek.
+# The team state file is reloaded when it changes on disk, so adding results with
+# TeamState.update doesn't need a restart. The same predictor is served over HTTP for other
+# tools on the machine.
+#
+# Usage:
+#   save_model(clf, encoder, 'match_model.joblib')                  # after training (script 3)
+#   predictor = MatchPredictor.load('match_model.joblib', 'team_state.npz')
+#   predictor.predict(fixtures)      # fixtures: DataFrame or list of dicts with Wk, Date, Home, Away, Referee, Venue
+#
+#   python match_service.py match_model.joblib team_state.npz --port 8765
+#   curl -d '[{"Wk": 25, "Date": "2024-02-17", "Home": "Chelsea", ...}]' http://127.0.0.1:8765/predict
+
+import argparse
+import http.server
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestClassifier
+
+from compiled_forest import compile_forest
+from match_encoding import CategoryEncoder
+from match_features import feature_name
+from team_state import TeamState
+
+PORT = 8765
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def save_model(model, encoder, path):
+    path = Path(path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    joblib.dump({
+        'model': model,
+        'schema': {'columns': encoder.columns, 'numeric_columns': encoder.numeric_columns, 'categories': encoder.categories},
+        'sklearn_version': sklearn.__version__
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+
+# The given columns of a DataFrame or a list of dicts as lists (None for columns no fixture has).
+# Every fixture needs a Home and Away team.
+def fixture_columns(fixtures, names):
+    if isinstance(fixtures, pd.DataFrame):
+        columns = {name: fixtures[name].to_numpy() if name in fixtures else None for name in names}
+    else:
+        fixtures = list(fixtures)
+        present = set().union(*fixtures) if fixtures else set()
+        columns = {name: [fixture.get(name) for fixture in fixtures] if name in present else None for name in names}
+    n = len(fixtures)
+    for name in ('Home', 'Away'):
+        if columns.get(name) is None or any(team is None for team in columns[name]):
+            raise KeyError(f"Every fixture needs a '{name}' team")
+    return columns, n
+
+
+class MatchPredictor:
+    def __init__(self, model, encoder, state, state_path=None):
+        self.model = model
+        # Random forests are scored from flat node arrays (same probabilities, far less overhead per call)
+        self.scorer = compile_forest(model) if isinstance(model, RandomForestClassifier) and model.n_outputs_ == 1 else model
+        self.encoder = encoder
+        self.classes = [str(label) for label in model.classes_]
+        self.lookup = {column: {category: code for code, category in enumerate(encoder.categories[column])}
+                       for column in encoder.columns}
+        self.state_path = Path(state_path).expanduser() if state_path else None
+        self.state_mtime = self.state_path.stat().st_mtime_ns if self.state_path else None
+        self.set_state(state)
+
+    @classmethod
+    def load(cls, model_path, state_path):
+        bundle = joblib.load(Path(model_path).expanduser())
+        if bundle['sklearn_version'] != sklearn.__version__:
+            print(f"Model was saved with scikit-learn {bundle['sklearn_version']}, running {sklearn.__version__}")
+        schema = bundle['schema']
+        encoder = CategoryEncoder(schema['columns'], schema['numeric_columns'], schema['categories'])
+        return cls(bundle['model'], encoder, TeamState.load(state_path), state_path)
+
+    def set_state(self, state):
+        form = {feature_name(side, metric, state.window) for metric in state.metrics for side in ('home', 'away')}
+        missing = [column for column in self.encoder.numeric_columns if 'rolling_avg' in column and column not in form]
+        if missing:
+            raise ValueError(f"Team state has no {', '.join(missing)}; it was built with other metrics or windows")
+        self.state = state
+
+    # Pick up a team state saved since the last call (cheap: one stat)
+    def refresh(self):
+        if self.state_path is None:
+            return False
+        mtime = self.state_path.stat().st_mtime_ns
+        if mtime == self.state_mtime:
+            return False
+        self.set_state(TeamState.load(self.state_path))
+        self.state_mtime = mtime
+        return True
+
+    # Feature matrix for fixtures, in the column order the model was trained on. It is built
+    # straight into a dense array (a matchweek is small) with the same values the encoder gives.
+    def features(self, fixtures):
+        columns, n = fixture_columns(fixtures, self.encoder.columns + self.encoder.numeric_columns + ['Date'])
+        X = np.zeros((n, self.encoder.n_features()), dtype=self.encoder.dtype)
+
+        form = {}
+        for side, team_column in (('home', 'Home'), ('away', 'Away')):
+            # A team without a match in the state has no form yet; it counts as 0, as a
+            # hand-built match dict left it
+            means = np.nan_to_num(self.state.means(self.state.rows_for(columns[team_column])), nan=0.0)
+            for i, metric in enumerate(self.state.metrics):
+                form[feature_name(side, metric, self.state.window)] = means[:, i]
+        weekdays = None
+        if columns.get('Date') is not None:
+            dates = np.asarray(columns['Date'], dtype='datetime64[D]')
+            # Days since 1970-01-01 (a Thursday), so +3 makes Monday 0. A missing date is -1, no day.
+            weekdays = np.where(np.isnat(dates), -1, (dates.astype(np.int64) + 3) % 7)
+
+        for i, column in enumerate(self.encoder.numeric_columns):
+            if columns.get(column) is not None:
+                # Fixtures without the value (left out or null) get 0, as encode_records fills them
+                X[:, i] = np.nan_to_num(np.asarray(columns[column], dtype=float), nan=0.0)
+            elif column in form:
+                X[:, i] = form[column]
+            elif column.startswith('Day_') and weekdays is not None and column[len('Day_'):] in DAYS:
+                X[:, i] = weekdays == DAYS.index(column[len('Day_'):])
+
+        offset = len(self.encoder.numeric_columns)
+        for column in self.encoder.columns:
+            lookup = self.lookup[column]
+            if columns.get(column) is None:
+                offset += len(lookup)
+                continue
+            codes = np.fromiter((lookup.get(value, -1) for value in columns[column]), dtype=np.int64, count=n)
+            known = np.flatnonzero(codes >= 0)
+            X[known, offset + codes[known]] = 1
+            offset += len(lookup)
+        return X
+
+    # Home win / Draw / Away win probabilities for each fixture, one row per fixture
+    def predict_proba(self, fixtures):
+        return self.scorer.predict_proba(self.features(fixtures))
+
+    def predict(self, fixtures):
+        index = fixtures.index if isinstance(fixtures, pd.DataFrame) else None
+        return pd.DataFrame(self.predict_proba(fixtures), columns=self.classes, index=index)
+
+    # The same for plain dicts (as sent to the HTTP endpoint), with each fixture's Date, Home and Away
+    def predict_records(self, records):
+        probabilities = self.predict_proba(records).tolist()
+        keys = [key for key in ('Date', 'Home', 'Away') if records and key in records[0]]
+        return [dict({key: str(record.get(key)) for key in keys}, **dict(zip(self.classes, row)))
+                for record, row in zip(records, probabilities)]
+
+
+# POST /predict with a JSON list of fixtures (or {"fixtures": [...]}) returns {"predictions": [...],
+# "milliseconds": ...}, one {"Date", "Home", "Away", "Home win", "Draw", "Away win"} per fixture.
+# GET /health reports the loaded model and team state.
+class PredictionServer:
+    def __init__(self, predictor, host='127.0.0.1', port=PORT):
+        self.predictor = predictor
+        # Predictions are fast, so one at a time keeps refresh() and the model single-threaded
+        self.lock = threading.Lock()
+        self.server = http.server.ThreadingHTTPServer((host, port), self.make_handler())
+        self.thread = None
+
+    def make_handler(self):
+        service = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def send_json(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if urlsplit(self.path).path != '/health':
+                    self.send_json(404, {'error': 'not found'})
+                    return
+                predictor = service.predictor
+                self.send_json(200, {'classes': predictor.classes, 'features': predictor.encoder.n_features(),
+                                     'teams': len(predictor.state.teams), 'matches': len(predictor.state.seen)})
+
+            def do_POST(self):
+                if urlsplit(self.path).path != '/predict':
+                    self.send_json(404, {'error': 'not found'})
+                    return
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                    fixtures = payload['fixtures'] if isinstance(payload, dict) else payload
+                    if not isinstance(fixtures, list) or not all(isinstance(fixture, dict) for fixture in fixtures):
+                        raise ValueError("Expected a list of fixture objects")
+                    started = time.perf_counter()
+                    with service.lock:
+                        service.predictor.refresh()
+                        predictions = service.predictor.predict_records(fixtures)
+                    elapsed = time.perf_counter() - started
+                except (ValueError, KeyError, TypeError) as e:
+                    self.send_json(400, {'error': f"{type(e).__name__}: {e}"})
+                    return
+                self.send_json(200, {'predictions': predictions, 'milliseconds': round(elapsed * 1000, 3)})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def url(self, path='/'):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}{path}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve match outcome predictions over HTTP")
+    parser.add_argument('model', help="Model saved with save_model (match_model.joblib)")
+    parser.add_argument('state', help="Team state saved with TeamState.save (team_state.npz)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args()
+
+    server = PredictionServer(MatchPredictor.load(args.model, args.state), args.host, args.port)
+    print(f"Serving predictions on {server.url('/predict')}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server.server_close()
@@ -0,0 +1,271 @@
+# Budgeted, cached hyperparameter search
+#
+# The match model and the xThreat notebook run exhaustive GridSearchCV, so every candidate gets
+# the full data on every fold (the XGBoost grid is ~19k candidates x 3 folds), the folds ignore
+# time order and nothing survives between runs. BudgetedSearch keeps the GridSearchCV interface
+# (fit, best_params_, best_score_, best_estimator_) but:
+#   - runs successive halving: every candidate is first scored on a small budget (a fraction of
+#     each fold's most recent training rows, or a few trees), and only the best 1/factor of them
+#     move on to a bigger one, until the survivors are scored on the full data
+#   - can use time-ordered folds (time_splits), which train on earlier matches and test on later ones
+#   - runs the (candidate, fold) fits in parallel over all cores
+#   - caches every fold score on disk, keyed by a hash of the data and folds plus the estimator,
+#     parameters and budget, so re-runs and extended grids only fit the new points
+#   - reports the wall-clock time against an estimate for the exhaustive grid
+#
+# Usage:
+#   search = BudgetedSearch(RandomForestClassifier(random_state=1), param_grid, cv=time_splits(train_data['Date']))
+#   search.fit(X_train, y_train)
+#   search.best_params_, search.report['saved_seconds']
+
+import hashlib
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.metrics import check_scoring
+from sklearn.model_selection import KFold, ParameterGrid
+
+# Smallest number of training rows a candidate is scored on in the first round
+MIN_SAMPLES = 50
+CACHE_DIR = Path(os.environ.get('FOOTBALL_SEARCH_CACHE', Path.home() / '.cache' / 'football-search'))
+
+
+# Expanding-window folds over match dates: fold k trains on the first k+1 blocks of matches
+# and tests on the next block. Matches played on the same day always land on the same side.
+def time_splits(dates, n_splits=5):
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy()
+    order = np.argsort(dates, kind='stable')
+    sorted_dates = dates[order]
+    bounds = np.linspace(0, len(dates), n_splits + 2).astype(int)
+    edges = np.searchsorted(sorted_dates, sorted_dates[np.minimum(bounds[1:-1], len(dates) - 1)], side='left')
+    edges = np.unique(np.concatenate([[0], edges, [len(dates)]]))
+    return [(order[:edges[k]], order[edges[k]:edges[k + 1]]) for k in range(1, len(edges) - 1)]
+
+
+def hash_array(digest, values):
+    if sparse.issparse(values):
+        values = values.tocsr()
+        for part in (values.data, values.indices, values.indptr, np.array(values.shape)):
+            digest.update(np.ascontiguousarray(part).tobytes())
+    elif isinstance(values, (pd.DataFrame, pd.Series)):
+        digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+        digest.update(repr(list(values.columns) if isinstance(values, pd.DataFrame) else values.name).encode('utf-8'))
+    else:
+        digest.update(np.ascontiguousarray(np.asarray(values)).tobytes())
+
+
+def data_hash(X, y, splits):
+    digest = hashlib.sha256()
+    hash_array(digest, X)
+    hash_array(digest, y)
+    for train, test in splits:
+        digest.update(np.asarray(train, dtype=np.int64).tobytes())
+        digest.update(b'|')
+        digest.update(np.asarray(test, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def take(values, rows):
+    return values.iloc[rows] if isinstance(values, (pd.DataFrame, pd.Series)) else values[rows]
+
+
+# Runs in a worker: fit one candidate on one fold with a given budget and score it
+def fit_and_score(estimator, params, X, y, train, test, scoring, resource, budget):
+    start = time.perf_counter()
+    estimator = clone(estimator).set_params(**params)
+    if resource == 'n_samples':
+        # The most recent fraction of the training rows (folds are in time order for time_splits)
+        train = train[-max(int(round(budget * len(train))), 1):]
+    else:
+        estimator.set_params(**{resource: budget})
+    estimator.fit(take(X, train), take(y, train))
+    score = check_scoring(estimator, scoring)(estimator, take(X, test), take(y, test))
+    return float(score), time.perf_counter() - start
+
+
+class FoldCache:
+    def __init__(self, directory, data_key):
+        self.path = Path(directory).expanduser() / f'{data_key}.json' if directory else None
+        self.entries = {}
+        if self.path and self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text())
+            except ValueError:
+                self.entries = {}
+
+    def save(self):
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.tmp')
+            tmp_path.write_text(json.dumps(self.entries))
+            os.replace(tmp_path, self.path)
+
+
+class BudgetedSearch:
+    def __init__(self, estimator, param_grid, scoring=None, cv=5, resource='n_samples', max_resources=None,
+                 min_resources=None, factor=3, n_jobs=-1, cache_dir=CACHE_DIR, time_budget=None, refit=True,
+                 report_path=None, verbose=1):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.scoring = scoring
+        self.cv = cv
+        self.resource = resource
+        self.max_resources = max_resources
+        self.min_resources = min_resources
+        self.factor = factor
+        self.n_jobs = n_jobs
+        self.cache_dir = cache_dir
+        self.time_budget = time_budget
+        self.refit = refit
+        self.report_path = report_path
+        self.verbose = verbose
+
+    def get_splits(self, X):
+        if isinstance(self.cv, int):
+            return [(np.asarray(train), np.asarray(test)) for train, test in KFold(self.cv).split(X)]
+        if hasattr(self.cv, 'split'):
+            return [(np.asarray(train), np.asarray(test)) for train, test in self.cv.split(X)]
+        return [(np.asarray(train), np.asarray(test)) for train, test in self.cv]
+
+    # Budgets from small to full, one per round of halving: enough rounds to get from all the
+    # candidates down to one, as long as the first budget still trains on MIN_SAMPLES rows. For
+    # n_samples the budgets are fractions of each fold's training rows, otherwise values of the
+    # estimator parameter.
+    def budgets(self, n_candidates, splits):
+        if self.resource == 'n_samples':
+            max_budget = self.max_resources or 1.0
+            smallest_fold = min(len(train) for train, _ in splits) * max_budget
+            min_budget = self.min_resources or max_budget * min(MIN_SAMPLES / smallest_fold, 1.0)
+        else:
+            max_budget = self.max_resources or self.estimator.get_params()[self.resource]
+            min_budget = self.min_resources or 1
+        rounds = 1 + min(math.ceil(math.log(n_candidates, self.factor) - 1e-9) if n_candidates > 1 else 0,
+                         math.floor(math.log(max_budget / min_budget, self.factor) + 1e-9))
+        budgets = [max_budget / self.factor ** (rounds - 1 - i) for i in range(rounds)]
+        if self.resource == 'n_samples':
+            return [round(budget, 6) for budget in budgets]
+        return [max(int(budget), 1) for budget in budgets]
+
+    def cache_key(self, params, fold, budget):
+        base = {name: value for name, value in self.estimator.get_params(deep=False).items() if name not in params}
+        return hashlib.sha256(json.dumps({
+            'estimator': type(self.estimator).__module__ + '.' + type(self.estimator).__qualname__,
+            'base': base, 'params': params, 'fold': fold, 'resource': self.resource, 'budget': budget,
+            'scoring': self.scoring
+        }, sort_keys=True, default=repr).encode('utf-8')).hexdigest()
+
+    def fit(self, X, y):
+        started = time.perf_counter()
+        splits = self.get_splits(X)
+        candidates = list(ParameterGrid(self.param_grid))
+        if any(self.resource in params for params in candidates):
+            raise ValueError(f"{self.resource} is searched over, so it can't also be the budget; use resource='n_samples'")
+        cache = FoldCache(self.cache_dir, data_hash(X, y, splits))
+        budgets = self.budgets(len(candidates), splits)
+
+        rows = []
+        alive = list(range(len(candidates)))
+        fitted = cached = 0
+        for round_number, budget in enumerate(budgets):
+            if self.time_budget is not None and round_number > 0 and time.perf_counter() - started > self.time_budget:
+                if self.verbose:
+                    print(f"Time budget used up, stopping before round {round_number + 1}")
+                break
+
+            jobs = [(c, fold) for c in alive for fold in range(len(splits))]
+            keys = {(c, fold): self.cache_key(candidates[c], fold, budget) for c, fold in jobs}
+            todo = [(c, fold) for c, fold in jobs if keys[(c, fold)] not in cache.entries]
+            results = Parallel(n_jobs=self.n_jobs)(
+                delayed(fit_and_score)(self.estimator, candidates[c], X, y, *splits[fold], self.scoring, self.resource, budget)
+                for c, fold in todo
+            )
+            for (c, fold), (score, seconds) in zip(todo, results):
+                cache.entries[keys[(c, fold)]] = {'score': score, 'seconds': seconds}
+            cache.save()
+            fitted += len(todo)
+            cached += len(jobs) - len(todo)
+
+            scores = {}
+            for c in alive:
+                fold_scores = [cache.entries[keys[(c, fold)]]['score'] for fold in range(len(splits))]
+                scores[c] = float(np.mean(fold_scores))
+                rows.append({'round': round_number, 'budget': budget, 'candidate': c, 'params': candidates[c],
+                             'mean_score': scores[c], 'std_score': float(np.std(fold_scores))})
+            if self.verbose:
+                print(f"Round {round_number + 1}/{len(budgets)}: {len(alive)} candidates x {len(splits)} folds "
+                      f"at {self.resource}={budget} ({len(todo)} fitted, {len(jobs) - len(todo)} cached)")
+
+            ranked = sorted(alive, key=lambda c: scores[c], reverse=True)
+            last_scores = scores
+            if round_number < len(budgets) - 1:
+                alive = ranked[:max(1, math.ceil(len(alive) / self.factor))]
+
+        self.results_ = pd.DataFrame(rows)
+        best = max(last_scores, key=last_scores.get)
+        self.best_index_ = best
+        self.best_params_ = candidates[best]
+        self.best_score_ = last_scores[best]
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+            if self.resource != 'n_samples':
+                self.best_estimator_.set_params(**{self.resource: budgets[-1]})
+            self.best_estimator_.fit(X, y)
+
+        self.report = self.make_report(candidates, splits, cache, budgets, fitted, cached, time.perf_counter() - started)
+        if self.report_path:
+            path = Path(self.report_path).expanduser()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(self.report, indent=1, default=repr))
+        if self.verbose:
+            print(f"Best {self.best_params_} score {self.best_score_:.4f} in {self.report['wall_clock_seconds']:.1f}s; "
+                  f"an exhaustive grid would take about {self.report['exhaustive_seconds']:.1f}s "
+                  f"({self.report['saved_seconds']:.1f}s saved)")
+        return self
+
+    # Wall clock of this search against an exhaustive grid on the same cores: every candidate on
+    # every fold at the full budget. Candidates dropped early are costed from their largest
+    # measured budget, scaled by how much longer the survivors took at the full budget than at
+    # that one (fit time is far from linear in the budget).
+    def make_report(self, candidates, splits, cache, budgets, fitted, cached, wall_clock):
+        seconds = {}
+        for c in range(len(candidates)):
+            for fold in range(len(splits)):
+                for budget in budgets:
+                    entry = cache.entries.get(self.cache_key(candidates[c], fold, budget))
+                    if entry:
+                        seconds[(c, fold, budget)] = entry['seconds']
+        scale = {}
+        for budget in budgets:
+            pairs = [(seconds[(c, fold, budgets[-1])], seconds[(c, fold, budget)]) for c, fold, b in seconds
+                     if b == budget and (c, fold, budgets[-1]) in seconds]
+            full, partial = np.sum(pairs, axis=0) if pairs else (budgets[-1], budget)
+            scale[budget] = full / partial
+
+        exhaustive_fit_seconds = 0.0
+        for c in range(len(candidates)):
+            for fold in range(len(splits)):
+                budget = max(b for b in budgets if (c, fold, b) in seconds)
+                exhaustive_fit_seconds += seconds[(c, fold, budget)] * scale[budget]
+        workers = min(effective_n_jobs(self.n_jobs), len(candidates) * len(splits))
+        exhaustive = exhaustive_fit_seconds / workers
+        return {
+            'candidates': len(candidates),
+            'folds': len(splits),
+            'budgets': budgets,
+            'fits': fitted,
+            'cached_fits': cached,
+            'exhaustive_fits': len(candidates) * len(splits),
+            'wall_clock_seconds': wall_clock,
+            'exhaustive_seconds': exhaustive,
+            'saved_seconds': exhaustive - wall_clock,
+            'best_params': self.best_params_,
+            'best_score': self.best_score_
+        }
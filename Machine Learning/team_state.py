@@ -0,0 +1,182 @@
+# Persisted per-team rolling form, updated one matchweek at a time
+#
+# Adding a matchweek to MLMatchPrediction.csv used to mean rerunning the feature engineering
+# over every season since 2018. TeamState keeps, for every team, a ring buffer of its last
+# `window` values of each metric (the same metrics as match_features), so new results are
+# added in O(new matches) and the rolling averages for upcoming fixtures are read straight
+# from it. Matches it has already seen are skipped, so the whole CSV can be passed in again
+# after a new matchweek is appended. The state is saved as a small .npz file.
+#
+# Usage:
+#   state = TeamState.load('team_state.npz')       # or TeamState(metrics=['goals', 'xG'])
+#   state.update(new_results)                      # feature rows each match had before it was played
+#   features = state.features(upcoming_fixtures)   # home_rolling_avg_goals, ...
+#   state.save('team_state.npz')
+#
+#   python team_state.py MLMatchPrediction.csv     # check incremental updates match a backfill
+
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from match_features import METRICS, WINDOW, feature_name, rolling_form, team_matches
+
+# team_matches' result columns and their default names; a fixture is played once they are all filled in
+RESULT_COLUMNS = {'home_goals': 'home_goals', 'away_goals': 'away_goals', 'home_xg': 'xG', 'away_xg': 'xG.1'}
+
+
+def match_keys(df, home='Home', away='Away', date='Date'):
+    return pd.to_datetime(df[date]).dt.strftime('%Y-%m-%d') + '|' + df[home].astype(str) + '|' + df[away].astype(str)
+
+
+class TeamState:
+    def __init__(self, metrics=('goals', 'xG'), window=WINDOW):
+        self.metrics = list(metrics)
+        self.window = window
+        self.teams = {}
+        # buffers[row, i % window] holds a team's i-th match; counts is how many it has played
+        self.buffers = np.zeros((0, window, len(self.metrics)))
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.seen = set()
+
+    def team_row(self, team):
+        row = self.teams.get(team)
+        if row is None:
+            row = self.teams[team] = len(self.teams)
+            if row == len(self.counts):
+                # Grow by doubling so adding teams stays cheap
+                size = max(2 * row, 32)
+                self.buffers = np.concatenate([self.buffers, np.zeros((size - row, self.window, len(self.metrics)))])
+                self.counts = np.concatenate([self.counts, np.zeros(size - row, dtype=np.int64)])
+        return row
+
+    # Rolling means of the given team rows, NaN for teams without a match yet
+    def means(self, rows):
+        rows = np.asarray(rows)
+        known = rows >= 0
+        out = np.full((len(rows), len(self.metrics)), np.nan)
+        filled = np.minimum(self.counts[rows[known]], self.window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[known] = self.buffers[rows[known]].sum(axis=1) / filled[:, None]
+        return out
+
+    def push(self, row, values):
+        self.buffers[row, self.counts[row] % self.window] = values
+        self.counts[row] += 1
+
+    def rows_for(self, teams):
+        return np.array([self.teams.get(team, -1) for team in teams], dtype=np.int64)
+
+    # home_/away_ rolling averages for fixtures from the current state (as match_features names them)
+    def features(self, fixtures, home='Home', away='Away'):
+        sides = {'home': self.means(self.rows_for(fixtures[home])), 'away': self.means(self.rows_for(fixtures[away]))}
+        return self.to_frame(sides, fixtures.index)
+
+    def to_frame(self, sides, index):
+        columns = {}
+        for i, metric in enumerate(self.metrics):
+            for side in ('home', 'away'):
+                columns[feature_name(side, metric, self.window)] = sides[side][:, i]
+        return pd.DataFrame(columns, index=index)
+
+    # Add played matches that haven't been seen yet, in date order. Returns the feature rows each
+    # new match had just before it was played (so the whole history gives the backfill).
+    # Fixtures without a score or xG yet are left out, so they are added once their result is in.
+    def update(self, df, home='Home', away='Away', date='Date', **columns):
+        df = df.dropna(subset=[columns.get(name, default) for name, default in RESULT_COLUMNS.items()])
+        keys = match_keys(df, home, away, date)
+        new = df[~keys.isin(self.seen).to_numpy()].assign(_key=keys).sort_values(date, kind='stable')
+        long = team_matches(new, home=home, away=away, date=date, **columns)
+        values = long[[METRICS[metric] for metric in self.metrics]].to_numpy(dtype=float)
+
+        n = len(new)
+        home_rows = np.array([self.team_row(team) for team in new[home]], dtype=np.int64)
+        away_rows = np.array([self.team_row(team) for team in new[away]], dtype=np.int64)
+        before = np.empty((2, n, len(self.metrics)))
+        for i in range(n):
+            before[:, i] = self.means([home_rows[i], away_rows[i]])
+            self.push(home_rows[i], values[i])
+            self.push(away_rows[i], values[n + i])
+        self.seen.update(new['_key'])
+
+        return self.to_frame({'home': before[0], 'away': before[1]}, new.index)
+
+    def save(self, path):
+        path = Path(path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        n = len(self.teams)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, metrics=np.array(self.metrics, dtype=str), window=self.window,
+                                teams=np.array(list(self.teams), dtype=str), buffers=self.buffers[:n],
+                                counts=self.counts[:n], seen=np.array(sorted(self.seen), dtype=str))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(Path(path).expanduser(), allow_pickle=False) as data:
+            state = cls(metrics=data['metrics'].tolist(), window=int(data['window']))
+            state.teams = {team: row for row, team in enumerate(data['teams'].tolist())}
+            state.buffers = data['buffers'].copy()
+            state.counts = data['counts'].copy()
+            state.seen = set(data['seen'].tolist())
+        return state
+
+
+# Build the state from a first part of the history, save and reload it, then add the rest one
+# matchweek at a time. Every feature value and the final state must be identical to a single
+# backfill over the whole history (and agree with match_features.rolling_form).
+def check_incremental(df, metrics=('goals', 'xG'), window=WINDOW, initial_fraction=0.5):
+    df = df.sort_values('Date', kind='stable')
+    backfill = TeamState(metrics, window)
+    expected = backfill.update(df)
+
+    split = int(len(df) * initial_fraction)
+    incremental = TeamState(metrics, window)
+    parts = [incremental.update(df.iloc[:split])]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        incremental.save(Path(tmp_dir) / 'team_state.npz')
+        incremental = TeamState.load(Path(tmp_dir) / 'team_state.npz')
+    # Matchweeks arrive one at a time, and each time the whole file so far is passed in again
+    weeks = pd.to_datetime(df['Date']).dt.to_period('W').dt.start_time.to_numpy()
+    for week in pd.unique(weeks[split:]):
+        parts.append(incremental.update(df.iloc[:split + np.searchsorted(weeks[split:], week, side='right')]))
+    actual = pd.concat(parts).reindex(expected.index)
+
+    problems = []
+    if not np.array_equal(actual.to_numpy(), expected.to_numpy(), equal_nan=True):
+        problems.append("incremental feature rows differ from the backfill")
+    n = len(backfill.teams)
+    if incremental.teams != backfill.teams or not np.array_equal(incremental.buffers[:n], backfill.buffers[:n]) \
+            or not np.array_equal(incremental.counts[:n], backfill.counts[:n]):
+        problems.append("incremental state differs from the backfill")
+    reference = rolling_form(df, metrics=metrics, windows=[window]).reindex(expected.index)[expected.columns]
+    if not np.allclose(expected.to_numpy(), reference.to_numpy(), equal_nan=True, rtol=0, atol=1e-12):
+        problems.append("backfill differs from match_features.rolling_form")
+
+    for problem in problems:
+        print(problem)
+    if not problems:
+        print(f"Incremental updates over {len(pd.unique(weeks[split:]))} matchweeks match the backfill of {len(df)} matches")
+    return not problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that incremental team state updates match a full backfill")
+    parser.add_argument('csv', help="MLMatchPrediction.csv")
+    parser.add_argument('--save', help="Also save the backfilled state here")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv).dropna(subset=['Score', 'xG', 'xG.1'])
+    df[['home_goals', 'away_goals']] = df['Score'].str.split('–', expand=True).astype(float)
+    df['Date'] = pd.to_datetime(df['Date'])
+    ok = check_incremental(df)
+    if args.save:
+        state = TeamState()
+        state.update(df)
+        state.save(args.save)
+    raise SystemExit(0 if ok else 1)
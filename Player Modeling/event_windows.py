@@ -0,0 +1,125 @@
+# Windowed joins between event tables (e.g. "passes in the 15 seconds before each shot")
+#
+# The xDanger notebook found the passes before each shot by filtering the whole pass table once
+# per shot, which is O(shots x passes), and built pass chains with a row-by-row loop. Here both
+# tables are keyed by their group (match, team, ...) and time, the events are sorted once, and
+# each anchor's window [time - before, time + after) is found with two binary searches, so the
+# work is linear in the number of events plus the number of matches returned.
+#
+# before=None makes the window reach back to the start of the group, which with
+# by=['match_id', 'possession_id'] gives possession windows instead of fixed-length ones.
+#
+# Usage:
+#   passes['shot'] = events_in_window(passes, shots, before=15).astype(int)
+#   pairs = window_pairs(passes, shots, before=15)                  # one row per (pass, shot)
+#   shots['last_chain'] = last_in_window(passes, shots, before=15, column='chain')
+#   passes['chain'] = chain_ids(passes, gap=15)
+#   in_possession = events_in_window(passes, shots, before=None, by=['match_id', 'possession_id'])
+
+import numpy as np
+import pandas as pd
+
+BY = ['match_id', 'team_id']
+TIME = 'time_seconds'
+
+
+# Group number of every row of events, then of anchors, numbered over both tables together
+def group_codes(events, anchors, by):
+    keys = pd.concat([events[by], anchors[by]], ignore_index=True)
+    codes = keys.groupby(by, sort=False, dropna=False).ngroup().to_numpy()
+    return codes[:len(events)], codes[len(events):]
+
+
+# Positions of the events in (group, time) order, and for every anchor the range [lo, hi) of
+# that order falling inside its window
+def window_bounds(events, anchors, before=15, after=0, by=BY, time=TIME):
+    by = [by] if isinstance(by, str) else list(by)
+    event_codes, anchor_codes = group_codes(events, anchors, by)
+    event_times = events[time].to_numpy(dtype=np.float64, na_value=np.nan)
+    anchor_times = anchors[time].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    # One sortable key per row: the group number, then the time within the group. Each group
+    # gets a stretch of the key wider than any window, so windows never cross into the next group.
+    times = np.concatenate([event_times, anchor_times])
+    start = np.nanmin(times) if np.isfinite(times).any() else 0.0
+    span = (np.nanmax(times) - start if np.isfinite(times).any() else 0.0) + (before or 0) + after + 1
+    event_keys = event_codes * span + (event_times - start)
+    anchor_base = anchor_codes * span
+    anchor_offsets = anchor_times - start
+
+    order = np.argsort(event_keys, kind='stable')
+    sorted_keys = event_keys[order]
+    lower = anchor_base if before is None else anchor_base + np.maximum(anchor_offsets - before, 0)
+    lo = np.searchsorted(sorted_keys, lower, side='left')
+    hi = np.searchsorted(sorted_keys, anchor_base + anchor_offsets + after, side='left')
+
+    # Anchors without a time match nothing
+    missing = np.isnan(anchor_times)
+    hi = np.where(missing | (hi < lo), lo, hi)
+    return order, lo, hi
+
+
+# One row per (event, anchor) match: the index labels of both and how long before the anchor
+# the event happened
+def window_pairs(events, anchors, before=15, after=0, by=BY, time=TIME):
+    order, lo, hi = window_bounds(events, anchors, before, after, by, time)
+    counts = hi - lo
+    anchor_positions = np.repeat(np.arange(len(anchors)), counts)
+    sorted_positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+    event_positions = order[sorted_positions]
+
+    return pd.DataFrame({
+        'event': events.index.take(event_positions),
+        'anchor': anchors.index.take(anchor_positions),
+        'gap': anchors[time].to_numpy(dtype=np.float64, na_value=np.nan)[anchor_positions]
+               - events[time].to_numpy(dtype=np.float64, na_value=np.nan)[event_positions]
+    })
+
+
+# True for every event inside at least one anchor's window (without listing the pairs)
+def events_in_window(events, anchors, before=15, after=0, by=BY, time=TIME):
+    order, lo, hi = window_bounds(events, anchors, before, after, by, time)
+    # +1 where a window opens and -1 where it closes; a running total above 0 is inside one
+    depth = np.cumsum(np.bincount(lo, minlength=len(events) + 1) - np.bincount(hi, minlength=len(events) + 1))
+    inside = np.empty(len(events), dtype=bool)
+    inside[order] = depth[:len(events)] > 0
+    return pd.Series(inside, index=events.index)
+
+
+# Number of events inside each anchor's window
+def window_counts(events, anchors, before=15, after=0, by=BY, time=TIME):
+    _, lo, hi = window_bounds(events, anchors, before, after, by, time)
+    return pd.Series(hi - lo, index=anchors.index)
+
+
+# For each anchor, the latest event in its window: its index label, or its value in column.
+# Missing where the window is empty.
+def last_in_window(events, anchors, before=15, after=0, by=BY, time=TIME, column=None):
+    order, lo, hi = window_bounds(events, anchors, before, after, by, time)
+    values = events.index if column is None else events[column]
+    if len(events) == 0:
+        return pd.Series(np.nan, index=anchors.index)
+    found = hi > lo
+    last = pd.Series(values.take(order[np.where(found, hi - 1, 0)]).array, index=anchors.index)
+    return last.where(found)
+
+
+# Number consecutive events into chains. Events are taken in (by, time) order, and a new chain
+# starts whenever a by or split_on column changes or more than gap seconds pass between
+# events (gap=None never splits on time, e.g. split_on=['possession_id'] for possessions).
+def chain_ids(events, gap=15, by=('match_id',), split_on=('team_id',), time=TIME):
+    by, split_on = list(by), list(split_on)
+    ordered = events[by + split_on + [time]].reset_index(drop=True).sort_values(by + [time], kind='stable')
+
+    new_chain = np.zeros(len(ordered), dtype=bool)
+    new_chain[:1] = True
+    for column in by + split_on:
+        codes = pd.factorize(ordered[column], use_na_sentinel=False)[0]
+        new_chain[1:] |= codes[1:] != codes[:-1]
+    if gap is not None:
+        times = ordered[time].to_numpy(dtype=np.float64, na_value=np.nan)
+        new_chain[1:] |= np.diff(times) > gap
+
+    chains = np.empty(len(ordered), dtype=np.int64)
+    chains[ordered.index.to_numpy()] = np.cumsum(new_chain)
+    return pd.Series(chains, index=events.index)
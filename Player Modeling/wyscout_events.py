@@ -0,0 +1,136 @@
+# Compact event table from a directory of Wyscout (v3) match event JSON files
+#
+# The xDanger notebook read every file into one list of Python dicts, turned that into a
+# DataFrame of dict columns and then pulled fields out one .apply(lambda) at a time, so the
+# whole dump sat in memory several times over. Here each file is decoded one event at a time
+# and only the fields in COLUMNS are kept, straight into typed columns: float32 coordinates,
+# small integers, nullable booleans and categoricals for repeated strings. Files are parsed in
+# parallel and the per-file tables are concatenated with their categories merged.
+#
+# Usage:
+#   df = load_events('wyscout_course/events_data')
+#   passes = df[(df['type_primary'] == 'pass') & df['pass_accurate'].fillna(False)]
+
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Output column -> (path into the event JSON, dtype)
+COLUMNS = {
+    'id': (('id',), 'Int64'),
+    'match_id': (('matchId',), 'Int32'),
+    'match_period': (('matchPeriod',), 'category'),
+    'minute': (('minute',), 'Int16'),
+    'second': (('second',), 'Int16'),
+    'type_primary': (('type', 'primary'), 'category'),
+    'location_x': (('location', 'x'), 'float32'),
+    'location_y': (('location', 'y'), 'float32'),
+    'team_id': (('team', 'id'), 'Int32'),
+    'team_name': (('team', 'name'), 'category'),
+    'player_id': (('player', 'id'), 'Int32'),
+    'player_name': (('player', 'name'), 'category'),
+    'player_position': (('player', 'position'), 'category'),
+    'pass_accurate': (('pass', 'accurate'), 'boolean'),
+    'pass_end_x': (('pass', 'endLocation', 'x'), 'float32'),
+    'pass_end_y': (('pass', 'endLocation', 'y'), 'float32'),
+    'shot_is_goal': (('shot', 'isGoal'), 'boolean'),
+    'possession_id': (('possession', 'id'), 'Int64')
+}
+
+SEPARATOR = re.compile(r'[\s,]*')
+
+
+# Decode the events of a JSON array one at a time, so only one event dict is alive at once.
+# Files holding {"events": [...]} are read whole.
+def iter_events(text):
+    start = SEPARATOR.match(text).end()
+    if text.startswith('{', start):
+        yield from json.loads(text).get('events', [])
+        return
+
+    decoder = json.JSONDecoder()
+    position = SEPARATOR.match(text, start + 1).end()
+    while not text.startswith(']', position):
+        event, position = decoder.raw_decode(text, position)
+        yield event
+        position = SEPARATOR.match(text, position).end()
+
+
+def lookup(event, path):
+    value = event
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def to_column(values, dtype):
+    if dtype == 'float32':
+        # NumPy turns None into NaN for float dtypes
+        return np.array(values, dtype=np.float32)
+    if dtype == 'category':
+        # Categories are always strings, even for a file without any values in the column, so the
+        # per-file columns can be merged with union_categoricals
+        categories = pd.Index([value for value in values if value is not None], dtype=str).unique().sort_values()
+        return pd.Categorical(values, categories=categories)
+    return pd.array(values, dtype=dtype)
+
+
+# Typed table of one file's events
+def read_event_file(path, columns=COLUMNS):
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    values = {name: [] for name in columns}
+    lookups = [(values[name], key_path) for name, (key_path, _) in columns.items()]
+    for event in iter_events(text):
+        for column, key_path in lookups:
+            column.append(lookup(event, key_path))
+
+    return pd.DataFrame({name: to_column(values[name], dtype) for name, (_, dtype) in columns.items()})
+
+
+# Concatenate per-file tables, merging the categories of categorical columns instead of
+# letting pd.concat fall back to object columns
+def concat_events(frames, columns=COLUMNS):
+    if not frames:
+        return empty_events(columns)
+    merged = {}
+    for name, (_, dtype) in columns.items():
+        if dtype == 'category':
+            merged[name] = union_categoricals([frame[name].array for frame in frames])
+        else:
+            merged[name] = pd.concat([frame[name] for frame in frames], ignore_index=True).array
+    return pd.DataFrame(merged)
+
+
+def empty_events(columns=COLUMNS):
+    return pd.DataFrame({name: to_column([], dtype) for name, (_, dtype) in columns.items()})
+
+
+# Load every .json file in a directory (files are parsed in parallel, in a stable order)
+def load_events(events_dir, columns=COLUMNS, workers=None, progress_every=50):
+    paths = sorted(Path(events_dir).glob('*.json'))
+    print(f"Found {len(paths)} JSON files to process")
+
+    frames = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(read_event_file, path, columns) for path in paths]
+        for i, (path, future) in enumerate(zip(paths, futures), start=1):
+            try:
+                frames.append(future.result())
+            except Exception as e:
+                print(f"Error processing {path.name}: {e}")
+            if i % progress_every == 0 or i == len(paths):
+                print(f"Processed {i}/{len(paths)} files ({i/len(paths)*100:.1f}%)")
+
+    df = concat_events(frames, columns)
+    print(f"Loaded {len(df)} total events from {len(paths)} files ({df.memory_usage(deep=True).sum() / 1e6:.1f} MB)")
+    return df
@@ -1,14 +1,21 @@
 # Load data from Statsbomb
 import math
+import sys
+import numpy as np
 import pandas as pd
 
 import matplotlib.pyplot as plt
 
 from PIL import Image
-from statsbombpy import sb
 from mplsoccer import VerticalPitch
 
-df = sb.events(match_id=69249).sort_values(by=['index'])
+# Events come from a local disk cache after the first download
+sys.path.append('../Data Gathering')
+from statsbomb_cache import sb
+from statsbomb_events import normalize_events, lineups
+
+# Unpack the nested location lists into float32 x/y columns once, for every chart below
+df = normalize_events(sb.events(match_id=69249)).sort_values(by=['index'])
 
 
 #Remove penalty shootouts data if neccessary 
@@ -36,31 +43,19 @@ def create_shotmap(team, ax):
     # the shots data is in the 'type' column
     team = team[team['type']=='Shot']
     
-    # Filter down to just the columns we need
-    team = team[['team', 'player', 'location', 'shot_outcome', 'shot_statsbomb_xg', 'shot_type']]
-    team[['x', 'y']] = team['location'].apply(pd.Series)
-    
-    # Draw the shotmap
-    for x in team.to_dict(orient='records'):
-    
-        pitch.scatter(
-            x=x['x'], y=x['y'], ax=ax, 
-            s=500 * x['shot_statsbomb_xg'], 
-            color='green' if x['shot_outcome'] == 'Goal' else 'white', 
-            edgecolors='black', alpha=0.7
-        )
+    # Draw the shotmap in one call, using the x/y columns from normalize_events
+    pitch.scatter(
+        x=team['x'].to_numpy(), y=team['y'].to_numpy(), ax=ax, 
+        s=500 * team['shot_statsbomb_xg'].to_numpy(), 
+        color=np.where(team['shot_outcome'] == 'Goal', 'green', 'white'), 
+        edgecolors='black', alpha=0.7
+    )
 
 # Functions for pass networks
-  def create_passnetwork(team, ax):
-    team[['x', 'y']] = team['location'].apply(pd.Series)
+def create_passnetwork(team, ax):
+    team = team.copy()
     
-    tactics = team[~team['tactics'].isnull()][['tactics', 'team']]
-
-    all_jersey_numbers = []
-    for y in tactics.to_dict(orient='records'):
-        all_jersey_numbers.append(pd.DataFrame([{'player_id': x['player']['id'], 'jersey_number': x['jersey_number']} for x in y['tactics']['lineup']]))
-        
-    jersey_numbers = pd.concat(all_jersey_numbers).drop_duplicates()
+    jersey_numbers = lineups(team)[['player_id', 'jersey_number']].drop_duplicates()
     
     # Make a new, single column for time and sort the events in chronological order
     team["newsecond"] = 60 * team["minute"] + team["second"]
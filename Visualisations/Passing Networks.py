@@ -1,8 +1,12 @@
+import sys
 import matplotlib.pyplot as plt
 import numpy as np
-from mplsoccer import Pitch, Sbopen
+from mplsoccer import Pitch
 import pandas as pd
-from statsbombpy import sb
+
+# StatsBomb data goes through a local disk cache, so each match is only downloaded once
+sys.path.append('../Data Gathering')
+from statsbomb_cache import sb, Sbopen
 
 #Find match ID of the last match at Upton Park
 matches = sb.matches(competition_id = 2, season_id = 27)
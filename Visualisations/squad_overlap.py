@@ -0,0 +1,118 @@
+# Squad overlap - players in common between every pair of clubs
+#
+# Builds a sparse squad x player incidence matrix from final_all_european_players.csv
+# and computes the number of shared players for every pair of squads with a single
+# sparse matrix product, instead of intersecting Python sets for every combination.
+# The result is saved as a small Parquet file which charts can load instantly.
+# The players can also come from a PlayerStore directory instead of the CSV.
+#
+# Usage:
+#   python squad_overlap.py final_all_european_players.csv squad_overlap.parquet
+#   python squad_overlap.py "../Data Gathering/player_store" squad_overlap.parquet
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+sys.path.append('../Data Gathering')
+from player_store import PlayerStore
+
+PLAYER_COLUMNS = ['Player', 'Born', 'Squad', 'League']
+
+
+# Create the squad x player incidence matrix (1 if a player was ever in the squad).
+# Players are identified by name and year of birth, like the PlayerID in the notebooks.
+def build_incidence_matrix(df):
+    df = df.dropna(subset=['Squad'])
+    squad_codes, squads = pd.factorize(df['Squad'], sort=True)
+    player_codes = df.groupby(['Player', 'Born'], dropna=False, sort=False).ngroup().to_numpy()
+
+    incidence = sparse.csr_matrix(
+        (np.ones(len(df), dtype=np.int32), (squad_codes, player_codes)),
+        shape=(len(squads), player_codes.max() + 1)
+    )
+    # A player appears once per season, so collapse repeat seasons to a single 1
+    incidence.sum_duplicates()
+    incidence.data[:] = 1
+    return incidence, pd.Index(squads, name='Squad')
+
+
+# Map each squad to its league, and label pairs from different leagues as International
+def pair_leagues(df, team1, team2):
+    team_league_map = (
+        df.dropna(subset=['Squad', 'League'])
+          .drop_duplicates(subset=['Squad'])
+          .set_index('Squad')['League']
+    )
+    league1 = team_league_map.reindex(team1).to_numpy()
+    league2 = team_league_map.reindex(team2).to_numpy()
+    both_known = pd.notna(league1) & pd.notna(league2)
+    return np.where(league1 == league2, league1, np.where(both_known, 'International', 'Unknown'))
+
+
+# Count the shared players for every pair of squads: a single sparse product M @ M.T,
+# keeping the upper triangle so each pair appears once with Team1 before Team2 alphabetically
+def build_overlap(df):
+    incidence, squads = build_incidence_matrix(df)
+    shared = sparse.triu(incidence @ incidence.T, k=1).tocoo()
+
+    overlap_df = pd.DataFrame({
+        'Team1': squads[shared.row],
+        'Team2': squads[shared.col],
+        'SharedPlayers': shared.data.astype(np.int32)
+    })
+    overlap_df['League'] = pair_leagues(df, overlap_df['Team1'], overlap_df['Team2'])
+
+    return (
+        overlap_df.sort_values(['SharedPlayers', 'Team1', 'Team2'], ascending=[False, True, True], kind='mergesort')
+                  .reset_index(drop=True)
+    )
+
+
+# Top k pairs within each league (International pairs are grouped together)
+def top_k_per_league(overlap_df, k=1):
+    return overlap_df.groupby('League', sort=False, observed=True).head(k).reset_index(drop=True)
+
+
+# Top k partner clubs for every club
+def top_k_per_club(overlap_df, k=5):
+    both_ways = pd.concat([
+        overlap_df.rename(columns={'Team1': 'Team', 'Team2': 'Partner'}),
+        overlap_df.rename(columns={'Team2': 'Team', 'Team1': 'Partner'})
+    ])
+    return (
+        both_ways.sort_values(['Team', 'SharedPlayers', 'Partner'], ascending=[True, False, True], kind='mergesort')
+                 .groupby('Team', sort=False, observed=True).head(k)
+                 .reset_index(drop=True)[['Team', 'Partner', 'SharedPlayers', 'League']]
+    )
+
+
+# Save the overlap table with categorical team and league columns to keep the file small
+def save_overlap(overlap_df, path):
+    compact = overlap_df.astype({'Team1': 'category', 'Team2': 'category', 'League': 'category'})
+    compact.to_parquet(path, index=False, compression='zstd')
+
+
+def load_overlap(path):
+    return pd.read_parquet(path)
+
+
+# Players from a CSV, or from a PlayerStore directory (only the columns the overlap needs are read)
+def load_players(source):
+    if Path(source).is_dir():
+        return PlayerStore(source).read(columns=PLAYER_COLUMNS)
+    return pd.read_csv(source)
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else 'final_all_european_players.csv'
+    output_path = sys.argv[2] if len(sys.argv) > 2 else 'squad_overlap.parquet'
+
+    overlap_df = build_overlap(load_players(source))
+    save_overlap(overlap_df, output_path)
+
+    print(f"{len(overlap_df)} squad pairs with players in common saved to {output_path}")
+    print(top_k_per_league(overlap_df))
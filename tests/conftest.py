@@ -0,0 +1,7 @@
+# The modules live in topic folders and import each other by name, as the notebooks do
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+for folder in ('Data Gathering', 'Player Modeling', 'Machine Learning'):
+    sys.path.insert(0, str(ROOT / folder))
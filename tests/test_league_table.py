@@ -0,0 +1,42 @@
+import asyncio
+
+import fetch
+from fixture_server import FixtureServer
+from league_table import TableWatcher
+
+PATH = '/sport/football/premier-league/table'
+
+
+def table_page(rows):
+    body = ''.join(f'<tr><td>{position}. {team}</td><td>{points}</td></tr>' for position, (team, points) in enumerate(rows, start=1))
+    return f'<html><body><p>Ad</p><table><thead><tr><th>Team</th><th>Pts</th></tr></thead><tbody>{body}</tbody></table></body></html>'
+
+
+def make_fetcher(cache_dir):
+    return fetch.Fetcher(cache_dir=cache_dir, rate_limiter=fetch.HostRateLimiter(limits={}, default=0))
+
+
+def test_update_stored_by_another_cache_user_is_published(tmp_path):
+    with FixtureServer({PATH: table_page([('Arsenal', '10'), ('Chelsea', '9')])}) as server:
+        watcher = TableWatcher(server.url(PATH), fetcher=make_fetcher(tmp_path))
+        published = []
+        watcher.subscribe(published.append)
+        asyncio.run(watcher.poll())
+
+        # Someone else sharing the cache revalidates first and stores the new table, so the
+        # watcher's own request is answered with a 304
+        server.set_page(PATH, table_page([('Chelsea', '12'), ('Arsenal', '10')]))
+        make_fetcher(tmp_path).get(server.url(PATH), max_age=0)
+        changes = asyncio.run(watcher.poll())
+
+        assert server.not_modified[PATH] == 1
+    assert {(change.team, tuple(change.columns)) for change in changes} == {('Chelsea', ('Position', 'Pts')), ('Arsenal', ('Position',))}
+    assert watcher.latest['Team'].tolist() == ['Chelsea', 'Arsenal']
+    assert published[-1] == changes
+
+
+def test_unchanged_table_gives_no_changes(tmp_path):
+    with FixtureServer({PATH: table_page([('Arsenal', '10'), ('Chelsea', '9')])}) as server:
+        watcher = TableWatcher(server.url(PATH), fetcher=make_fetcher(tmp_path))
+        assert len(asyncio.run(watcher.poll())) == 2
+        assert asyncio.run(watcher.poll()) == []
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from match_encoding import CategoryEncoder
+from match_service import MatchPredictor
+from team_state import TeamState
+
+FORM = ['home_rolling_avg_goals', 'away_rolling_avg_goals', 'home_rolling_avg_xG', 'away_rolling_avg_xG']
+NUMERIC = ['Wk'] + FORM + ['Day_Saturday', 'Day_Sunday']
+
+
+def training_matches(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    teams = ['Arsenal', 'Chelsea', 'Everton', 'Fulham']
+    home = rng.choice(teams, n)
+    df = pd.DataFrame({
+        'Wk': rng.integers(1, 39, n),
+        'Home': home,
+        'Away': [teams[(teams.index(team) + 1) % len(teams)] for team in home],
+        'Referee': rng.choice(['Referee 1', 'Referee 2'], n),
+        'Venue': [f'{team} Stadium' for team in home],
+        'Day_Saturday': rng.integers(0, 2, n).astype(bool)
+    })
+    df['Day_Sunday'] = ~df['Day_Saturday']
+    for column in FORM:
+        df[column] = rng.random(n) * 2
+    df['result'] = rng.choice(['Home win', 'Draw', 'Away win'], n)
+    return df
+
+
+def test_missing_numeric_values_match_encode_records():
+    df = training_matches()
+    encoder = CategoryEncoder().fit(df, NUMERIC)
+    model = RandomForestClassifier(n_estimators=10, random_state=1).fit(encoder.transform(df), df['result'])
+    # An empty state gives every team no form, which the predictor counts as 0
+    predictor = MatchPredictor(model, encoder, TeamState())
+
+    fixtures = [
+        {'Wk': 25, 'Date': '2024-02-17', 'Home': 'Chelsea', 'Away': 'Arsenal', 'Referee': 'Referee 1', 'Venue': 'Chelsea Stadium'},
+        {'Date': '2024-02-18', 'Home': 'Everton', 'Away': 'Fulham', 'Referee': 'Referee 2', 'Venue': 'Everton Stadium'},
+        {'Wk': None, 'Date': '2024-02-17', 'Home': 'Fulham', 'Away': 'Chelsea', 'Referee': 'Referee 9', 'Venue': 'Fulham Stadium'}
+    ]
+    records = [dict(fixture, Day_Saturday=fixture['Date'] == '2024-02-17', Day_Sunday=fixture['Date'] == '2024-02-18')
+               for fixture in fixtures]
+
+    expected = encoder.encode_records(records).toarray()
+    np.testing.assert_array_equal(predictor.features(fixtures), expected)
+    np.testing.assert_array_equal(predictor.predict_proba(fixtures), model.predict_proba(expected))
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from team_state import TeamState
+
+RESULTS = pd.DataFrame({
+    'Date': pd.to_datetime(['2024-08-10', '2024-08-17', '2024-08-24', '2024-08-31']),
+    'Home': ['Arsenal', 'Chelsea', 'Arsenal', 'Chelsea'],
+    'Away': ['Chelsea', 'Arsenal', 'Chelsea', 'Arsenal'],
+    'home_goals': [2.0, 1.0, 0.0, 3.0],
+    'away_goals': [0.0, 1.0, 2.0, 1.0],
+    'xG': [1.8, 0.9, 0.7, 2.4],
+    'xG.1': [0.4, 1.1, 1.5, 0.8]
+})
+
+
+def test_unplayed_fixtures_are_added_once_played():
+    fixtures = RESULTS.copy()
+    fixtures.loc[2:, ['home_goals', 'away_goals', 'xG', 'xG.1']] = np.nan
+
+    state = TeamState()
+    first = state.update(fixtures)
+    assert list(first.index) == [0, 1]
+    assert state.counts[state.teams['Arsenal']] == 2
+
+    second = state.update(RESULTS)
+    assert list(second.index) == [2, 3]
+
+    backfill = TeamState()
+    expected = backfill.update(RESULTS)
+    np.testing.assert_array_equal(pd.concat([first, second]).to_numpy(), expected.to_numpy())
+    assert state.seen == backfill.seen
+    np.testing.assert_array_equal(state.means([0, 1]), backfill.means([0, 1]))
+
+
+def test_fixture_missing_only_xg_is_not_seen():
+    fixtures = RESULTS.copy()
+    fixtures.loc[3, 'xG.1'] = np.nan
+
+    state = TeamState()
+    state.update(fixtures)
+
+    assert len(state.seen) == 3
+    assert len(state.update(RESULTS)) == 1
@@ -0,0 +1,40 @@
+import json
+
+import pandas as pd
+
+from wyscout_events import COLUMNS, concat_events, empty_events, read_event_file
+
+EVENTS = [
+    {'id': 1, 'matchId': 10, 'matchPeriod': '1H', 'minute': 0, 'second': 3, 'type': {'primary': 'pass'},
+     'location': {'x': 50, 'y': 50}, 'team': {'id': 7, 'name': 'Arsenal'}, 'player': {'id': 3, 'name': 'Saka'},
+     'pass': {'accurate': True, 'endLocation': {'x': 60, 'y': 40}}},
+    {'id': 2, 'matchId': 10, 'matchPeriod': '1H', 'minute': 0, 'second': 9, 'type': {'primary': 'shot'},
+     'location': {'x': 88, 'y': 52}, 'team': {'id': 7, 'name': 'Arsenal'}, 'player': {'id': 9, 'name': 'Havertz'},
+     'shot': {'isGoal': False}}
+]
+
+
+def write_events(path, events):
+    path.write_text(json.dumps(events), encoding='utf-8')
+    return path
+
+
+def test_empty_file_concatenates_with_other_files(tmp_path):
+    frames = [read_event_file(write_events(tmp_path / 'match.json', EVENTS)),
+              read_event_file(write_events(tmp_path / 'empty.json', []))]
+
+    df = concat_events(frames)
+
+    assert len(df) == 2
+    assert list(df.columns) == list(COLUMNS)
+    assert isinstance(df['type_primary'].dtype, pd.CategoricalDtype)
+    assert df['type_primary'].tolist() == ['pass', 'shot']
+    # A column with no values in either file still merges
+    assert df['player_position'].isna().all()
+
+
+def test_empty_events_concatenate_with_events(tmp_path):
+    df = concat_events([empty_events(), read_event_file(write_events(tmp_path / 'match.json', EVENTS))])
+
+    assert df['team_name'].tolist() == ['Arsenal', 'Arsenal']
+    assert df['pass_accurate'].tolist() == [True, pd.NA]